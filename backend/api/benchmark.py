@@ -0,0 +1,522 @@
+import asyncio
+import base64
+import io
+import time
+import tracemalloc
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from asgiref.sync import async_to_sync
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext
+from django.utils.crypto import get_random_string
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.importers import IngredientImporter, read_csv
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from recipes.search import update_search_vectors, uses_search_vector
+from recipes.services import bump_catalogue_version
+from users.models import Subscription, User
+from .constants import LENGTH_SHORT_URL
+
+BATCH_SIZE = 5000
+PASSWORD = 'Benchmark-Pa55word'
+IMAGE_NAME = 'media/recipes/benchmark.png'
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAA'
+    'DUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=='
+)
+
+Scenario = namedtuple(
+    'Scenario',
+    ('name', 'method', 'path', 'data', 'max_queries', 'setup', 'teardown',
+     'anonymous'),
+    defaults=(None, None, None, None, False)
+)
+
+
+def seed_dataset(users, recipes, rng, ingredients_per_recipe=8,
+                 tags=6, subscriptions=200, favorites=100, cart=30):
+    password = make_password(PASSWORD)
+    default_storage.save(IMAGE_NAME, ContentFile(
+        base64.b64decode(IMAGE.partition(';base64,')[2])
+    ))
+    User.objects.bulk_create(
+        (
+            User(
+                username=f'user{i}', email=f'user{i}@example.com',
+                first_name=f'Имя{i}', last_name=f'Фамилия{i}',
+                password=password
+            )
+            for i in range(users)
+        ),
+        batch_size=BATCH_SIZE
+    )
+    user_ids = list(User.objects.order_by('pk').values_list('pk', flat=True))
+    Tag.objects.bulk_create(
+        Tag(name=f'Тег {i}', slug=f'tag{i}') for i in range(tags)
+    )
+    tag_ids = list(Tag.objects.values_list('pk', flat=True))
+    with open(
+        settings.FILE_PATH_INGREDIENTS / 'ingredients.csv',
+        encoding='utf-8', newline=''
+    ) as file:
+        IngredientImporter(BATCH_SIZE).import_records(read_csv(file))
+    ingredient_ids = list(Ingredient.objects.values_list('pk', flat=True))
+
+    Recipe.objects.bulk_create(
+        (
+            Recipe(
+                author_id=rng.choice(user_ids),
+                name=f'Рецепт {i}',
+                text='Описание рецепта ' * 20,
+                cooking_time=rng.randint(1, 180),
+                image=IMAGE_NAME,
+                slug=get_random_string(LENGTH_SHORT_URL),
+            )
+            for i in range(recipes)
+        ),
+        batch_size=BATCH_SIZE
+    )
+    recipe_ids = list(Recipe.objects.values_list('pk', flat=True))
+    RecipeIngredient.objects.bulk_create(
+        (
+            RecipeIngredient(
+                recipe_id=recipe_id, ingredient_id=ingredient_id,
+                amount=rng.randint(1, 500)
+            )
+            for recipe_id in recipe_ids
+            for ingredient_id in rng.sample(
+                ingredient_ids, ingredients_per_recipe
+            )
+        ),
+        batch_size=BATCH_SIZE
+    )
+    update_search_vectors(Recipe.objects.all())
+    bump_catalogue_version(Recipe)
+    Recipe.tags.through.objects.bulk_create(
+        (
+            Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipe_ids
+            for tag_id in rng.sample(tag_ids, rng.randint(1, 3))
+        ),
+        batch_size=BATCH_SIZE
+    )
+
+    user = User.objects.get(pk=user_ids[0])
+    followed = rng.sample(user_ids[1:], min(subscriptions, users - 2))
+    Subscription.objects.bulk_create(
+        (
+            Subscription(user_id=user_id, author_id=author_id)
+            for user_id in user_ids
+            for author_id in (
+                followed if user_id == user.pk
+                else rng.sample(user_ids, min(3, users))
+            )
+            if author_id != user_id
+        ),
+        batch_size=BATCH_SIZE, ignore_conflicts=True
+    )
+    for model, count in ((Favorite, favorites), (ShoppingCart, cart)):
+        model.objects.bulk_create(
+            (
+                model(user_id=user_id, recipe_id=recipe_id)
+                for user_id in user_ids
+                for recipe_id in rng.sample(
+                    recipe_ids[1:],
+                    min(
+                        count if user_id == user.pk else 5,
+                        len(recipe_ids) - 1
+                    )
+                )
+            ),
+            batch_size=BATCH_SIZE, ignore_conflicts=True
+        )
+    call_command('repair_counters', stdout=io.StringIO())
+    call_command('rebuild_feed', stdout=io.StringIO())
+    call_command('build_recommendations', stdout=io.StringIO())
+    return user
+
+
+def get_dataset_size():
+    return {
+        model._meta.label_lower: model.objects.count()
+        for model in (
+            User, Tag, Ingredient, Recipe, RecipeIngredient,
+            Favorite, ShoppingCart, Subscription
+        )
+    }
+
+
+def get_scenarios(user, rng):
+    own_recipe = Recipe.objects.filter(author=user).first() or (
+        Recipe.objects.create(
+            author=user, name='Рецепт', text='Описание',
+            cooking_time=1, image=IMAGE_NAME
+        )
+    )
+    recipe = Recipe.objects.exclude(
+        favorites__user=user
+    ).exclude(shoppingcarts__user=user).first()
+    batch = {'recipes': list(Recipe.objects.exclude(
+        favorites__user=user
+    ).exclude(shoppingcarts__user=user).values_list('pk', flat=True)[:50])}
+    author = User.objects.exclude(pk=user.pk).exclude(
+        subscriptions_on_author__user=user
+    ).first()
+    tag = Tag.objects.first()
+    tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+    recipe_data = {
+        'ingredients': [
+            {'id': pk, 'amount': rng.randint(1, 100)}
+            for pk in Ingredient.objects.values_list('pk', flat=True)[:10]
+        ],
+        'tags': list(Tag.objects.values_list('pk', flat=True)[:2]),
+        'image': IMAGE,
+        'name': 'Новый рецепт',
+        'text': 'Описание',
+        'cooking_time': 10,
+    }
+
+    def create_recipe():
+        return Recipe.objects.create(
+            author=user, name='Удаляемый рецепт', text='Описание',
+            cooking_time=1, image=IMAGE_NAME
+        )
+
+    def delete_created(model, **lookup):
+        return lambda response: model.objects.filter(**lookup).delete()
+
+    def create_batch(model):
+        return lambda: model.objects.bulk_create(
+            model(user=user, recipe_id=pk) for pk in batch['recipes']
+        )
+
+    return (
+        Scenario(
+            'login', 'post', '/api/auth/token/login/',
+            {'email': user.email, 'password': PASSWORD},
+            max_queries=5, anonymous=True
+        ),
+        Scenario(
+            'me-list', 'get', '/api/users/?limit=100', max_queries=3
+        ),
+        Scenario(
+            'me-list', 'post', '/api/users/',
+            {
+                'email': 'new@example.com', 'username': 'new_user',
+                'first_name': 'Имя', 'last_name': 'Фамилия',
+                'password': PASSWORD
+            },
+            max_queries=4, anonymous=True,
+            teardown=delete_created(User, username='new_user')
+        ),
+        Scenario('me-me', 'get', '/api/users/me/', max_queries=1),
+        Scenario(
+            'me-detail', 'get', f'/api/users/{author.pk}/', max_queries=2
+        ),
+        Scenario(
+            'me-me-avatar', 'put', '/api/users/me/avatar/',
+            {'avatar': IMAGE}, max_queries=1
+        ),
+        Scenario(
+            'me-set-password', 'post', '/api/users/set_password/',
+            {'current_password': PASSWORD, 'new_password': PASSWORD},
+            max_queries=1
+        ),
+        Scenario(
+            'me-subscriptions', 'get',
+            '/api/users/subscriptions/?limit=100&recipes_limit=3',
+            max_queries=4
+        ),
+        Scenario(
+            'me-subscriptions', 'get',
+            '/api/users/subscriptions/?limit=100&recipes_limit=3&cursor=',
+            max_queries=3
+        ),
+        Scenario(
+            'me-subscribe', 'post', f'/api/users/{author.pk}/subscribe/',
+            max_queries=11,
+            teardown=delete_created(Subscription, user=user, author=author)
+        ),
+        Scenario(
+            'me-subscribe', 'delete', f'/api/users/{author.pk}/subscribe/',
+            max_queries=6,
+            setup=lambda: Subscription.objects.create(
+                user=user, author=author
+            )
+        ),
+        Scenario('tags-list', 'get', '/api/tags/', max_queries=2),
+        Scenario(
+            'tags-detail', 'get', f'/api/tags/{tag.pk}/', max_queries=1
+        ),
+        Scenario('ingredients-list', 'get', '/api/ingredients/',
+                 max_queries=2),
+        Scenario(
+            'ingredients-list', 'get', '/api/ingredients/?name=мол',
+            max_queries=1
+        ),
+        Scenario(
+            'ingredients-autocomplete', 'get',
+            '/api/ingredients/autocomplete/?name=малоко', max_queries=1
+        ),
+        Scenario(
+            'ingredients-detail', 'get',
+            f'/api/ingredients/{Ingredient.objects.first().pk}/',
+            max_queries=1
+        ),
+        Scenario('recipes-list', 'get', '/api/recipes/', max_queries=5),
+        Scenario(
+            'recipes-list', 'get', '/api/recipes/?limit=100', max_queries=5
+        ),
+        Scenario(
+            'recipes-list', 'get', '/api/recipes/?limit=100&cursor=',
+            max_queries=4
+        ),
+        Scenario(
+            'recipes-list', 'get',
+            '/api/recipes/?limit=100&' + '&'.join(
+                f'tags={slug}' for slug in tags
+            ),
+            max_queries=6
+        ),
+        Scenario(
+            'recipes-list', 'get', '/api/recipes/?limit=100&is_favorited=1',
+            max_queries=5
+        ),
+        Scenario(
+            'recipes-list', 'get',
+            '/api/recipes/?limit=100&is_in_shopping_cart=1', max_queries=5
+        ),
+        Scenario(
+            'recipes-list', 'get',
+            f'/api/recipes/?limit=100&author={author.pk}', max_queries=6
+        ),
+        Scenario(
+            'recipes-list', 'get', '/api/recipes/?limit=100&search=рецепт',
+            max_queries=5 if uses_search_vector() else 8
+        ),
+        Scenario(
+            'recipes-list', 'get', '/api/recipes/?limit=100&ordering=popular',
+            max_queries=5
+        ),
+        Scenario(
+            'recipes-feed', 'get', '/api/recipes/feed/?limit=100',
+            max_queries=5
+        ),
+        Scenario(
+            'recipes-recommended', 'get',
+            '/api/recipes/recommended/?limit=100', max_queries=6
+        ),
+        Scenario(
+            'recipes-what-to-cook', 'get',
+            '/api/recipes/what_to_cook/?limit=100&' + '&'.join(
+                f'ingredients={ingredient["id"]}'
+                for ingredient in recipe_data['ingredients']
+            ),
+            max_queries=6
+        ),
+        Scenario(
+            'recipes-list', 'post', '/api/recipes/', recipe_data,
+            max_queries=20,
+            teardown=lambda response: Recipe.objects.filter(
+                pk=response.data['id']
+            ).delete()
+        ),
+        Scenario(
+            'recipes-detail', 'get', f'/api/recipes/{recipe.pk}/',
+            max_queries=4
+        ),
+        Scenario(
+            'recipes-detail', 'patch', f'/api/recipes/{own_recipe.pk}/',
+            recipe_data, max_queries=24
+        ),
+        Scenario(
+            'recipes-detail', 'delete', '/api/recipes/{pk}/',
+            max_queries=14, setup=create_recipe
+        ),
+        Scenario(
+            'recipes-favorite', 'post', f'/api/recipes/{recipe.pk}/favorite/',
+            max_queries=7,
+            teardown=delete_created(Favorite, user=user, recipe=recipe)
+        ),
+        Scenario(
+            'recipes-favorite', 'delete',
+            f'/api/recipes/{recipe.pk}/favorite/', max_queries=5,
+            setup=lambda: Favorite.objects.create(user=user, recipe=recipe)
+        ),
+        Scenario(
+            'recipes-shopping-cart', 'post',
+            f'/api/recipes/{recipe.pk}/shopping_cart/', max_queries=7,
+            teardown=delete_created(ShoppingCart, user=user, recipe=recipe)
+        ),
+        Scenario(
+            'recipes-shopping-cart', 'delete',
+            f'/api/recipes/{recipe.pk}/shopping_cart/', max_queries=5,
+            setup=lambda: ShoppingCart.objects.create(
+                user=user, recipe=recipe
+            )
+        ),
+        Scenario(
+            'recipes-favorite-batch', 'post', '/api/recipes/favorite/batch/',
+            batch, max_queries=4,
+            teardown=delete_created(
+                Favorite, user=user, recipe__in=batch['recipes']
+            )
+        ),
+        Scenario(
+            'recipes-favorite-batch', 'delete',
+            '/api/recipes/favorite/batch/', batch, max_queries=5,
+            setup=create_batch(Favorite)
+        ),
+        Scenario(
+            'recipes-shopping-cart-batch', 'post',
+            '/api/recipes/shopping_cart/batch/', batch, max_queries=4,
+            teardown=delete_created(
+                ShoppingCart, user=user, recipe__in=batch['recipes']
+            )
+        ),
+        Scenario(
+            'recipes-shopping-cart-batch', 'delete',
+            '/api/recipes/shopping_cart/batch/', batch, max_queries=5,
+            setup=create_batch(ShoppingCart)
+        ),
+        Scenario(
+            'recipes-download-shopping-cart', 'get',
+            '/api/recipes/download_shopping_cart/', max_queries=2
+        ),
+        Scenario(
+            'recipes-download-shopping-cart', 'get',
+            '/api/recipes/download_shopping_cart/?file_format=csv',
+            max_queries=2
+        ),
+        Scenario(
+            'recipes-get-link', 'get', f'/api/recipes/{recipe.pk}/get-link/',
+            max_queries=1
+        ),
+        Scenario(
+            'redirect_full_url', 'get', f'/s/{recipe.slug}', max_queries=1,
+            anonymous=True
+        ),
+    )
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class BenchmarkRunner:
+
+    def __init__(self, user, repeat, concurrency=0):
+        self.repeat = repeat
+        self.concurrency = concurrency
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        self.anonymous_client = APIClient()
+        self.authorization = (
+            f'Token {Token.objects.get_or_create(user=user)[0].key}'
+        )
+
+    def request(self, scenario, queries=None):
+        obj = scenario.setup() if scenario.setup else None
+        path = scenario.path.format(pk=getattr(obj, 'pk', None))
+        client = (
+            self.anonymous_client if scenario.anonymous else self.client
+        )
+        with queries if queries is not None else nullcontext():
+            started = time.perf_counter()
+            response = getattr(client, scenario.method)(
+                path, scenario.data, format='json'
+            )
+            if response.streaming:
+                for _ in response.streaming_content:
+                    pass
+            elapsed = time.perf_counter() - started
+        if scenario.teardown:
+            scenario.teardown(response)
+        return response, elapsed
+
+    def run(self, scenario):
+        cache.clear()
+        queries = CaptureQueriesContext(connection)
+        response, _ = self.request(scenario, queries)
+        query_count = len(queries)
+        timings = [
+            self.request(scenario)[1] for _ in range(self.repeat)
+        ]
+        tracemalloc.start()
+        self.request(scenario)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return {
+            'name': scenario.name,
+            'method': scenario.method.upper(),
+            'path': scenario.path,
+            'status': response.status_code,
+            'queries': query_count,
+            'max_queries': scenario.max_queries,
+            'p50_ms': round(percentile(timings, 0.5) * 1000, 2),
+            'p95_ms': round(percentile(timings, 0.95) * 1000, 2),
+            'max_ms': round(max(timings) * 1000, 2),
+            'peak_memory_kb': round(peak / 1024, 1),
+            **self.run_concurrently(scenario),
+        }
+
+    def run_concurrently(self, scenario):
+        if (
+            not self.concurrency
+            or scenario.method != 'get'
+            or scenario.setup
+        ):
+            return {}
+        authorization = None if scenario.anonymous else self.authorization
+        requests = self.concurrency * self.repeat
+        started = time.perf_counter()
+        with ThreadPoolExecutor(self.concurrency) as executor:
+            for _ in executor.map(
+                lambda _: self.request_wsgi(scenario.path, authorization),
+                range(self.concurrency)
+            ):
+                pass
+        wsgi_elapsed = time.perf_counter() - started
+        started = time.perf_counter()
+        async_to_sync(self.request_asgi)(scenario.path, authorization)
+        asgi_elapsed = time.perf_counter() - started
+        return {
+            'concurrency': self.concurrency,
+            'wsgi_rps': round(requests / wsgi_elapsed, 1),
+            'asgi_rps': round(requests / asgi_elapsed, 1),
+        }
+
+    def request_wsgi(self, path, authorization):
+        client = Client()
+        headers = (
+            {'HTTP_AUTHORIZATION': authorization} if authorization else {}
+        )
+        try:
+            for _ in range(self.repeat):
+                client.get(path, **headers)
+        finally:
+            connections.close_all()
+
+    async def request_asgi(self, path, authorization):
+        client = AsyncClient()
+        headers = {'authorization': authorization} if authorization else {}
+
+        async def worker():
+            for _ in range(self.repeat):
+                await client.get(path, **headers)
+
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
@@ -0,0 +1,130 @@
+import hashlib
+import json
+from bisect import bisect_left, bisect_right
+from difflib import SequenceMatcher
+from operator import itemgetter
+
+from django.utils.http import quote_etag
+
+from recipes.models import Ingredient, Recipe, Tag
+from recipes.matching import RecipeIngredientIndex
+from recipes.recommendations import RecommendationModel
+from recipes.search import RecipeSearchIndex
+from recipes.services import get_catalogue_version, normalize_ingredient_name
+from .constants import TYPO_MIN_LENGTH, TYPO_MIN_RATIO, TYPO_PREFIX_LENGTH
+from .serializers import IngredientSerializer, TagSerialiser
+
+MAX_CHAR = chr(0x10ffff)
+
+
+class Catalogue:
+
+    def __init__(self, model, serializer_class):
+        self.model = model
+        self.serializer_class = serializer_class
+        self.version = None
+        self.current = None
+
+    def refresh(self):
+        version = get_catalogue_version(self.model)
+        current = self.current
+        if current is None or current.version != version:
+            current = type(self)(self.model, self.serializer_class)
+            current.build(list(self.model.objects.order_by('pk')))
+            current.version = version
+            self.current = current
+        return current
+
+    def build(self, instances):
+        self.items = tuple(
+            dict(item)
+            for item in self.serializer_class(instances, many=True).data
+        )
+        self.by_id = {item['id']: item for item in self.items}
+        self.etag = self.get_etag(self.items)
+
+    def filter(self, params):
+        return self.items
+
+    @staticmethod
+    def get_etag(items):
+        return quote_etag(hashlib.md5(
+            json.dumps(items, ensure_ascii=False, sort_keys=True).encode()
+        ).hexdigest())
+
+
+class TagCatalogue(Catalogue):
+
+    def build(self, instances):
+        super().build(instances)
+        self.by_slug = {item['slug']: item for item in self.items}
+
+
+class IngredientCatalogue(Catalogue):
+
+    def build(self, instances):
+        super().build(instances)
+        self.index = sorted(
+            (
+                ingredient.search_name
+                or normalize_ingredient_name(ingredient.name),
+                ingredient.pk
+            )
+            for ingredient in instances
+        )
+        self.keys = [key for key, _ in self.index]
+
+    def filter(self, params):
+        name = params.get('name')
+        if name:
+            return self.search(name)
+        return self.items
+
+    def get_prefix_range(self, prefix):
+        return (
+            bisect_left(self.keys, prefix),
+            bisect_right(self.keys, prefix + MAX_CHAR)
+        )
+
+    def search(self, name):
+        start, end = self.get_prefix_range(normalize_ingredient_name(name))
+        return [self.by_id[pk] for _, pk in self.index[start:end]]
+
+    def autocomplete(self, name, limit):
+        name = normalize_ingredient_name(name)
+        if not name:
+            return []
+        start, end = self.get_prefix_range(name)
+        found = [self.by_id[pk] for _, pk in self.index[start:end][:limit]]
+        if len(found) < limit:
+            found += [
+                self.by_id[pk] for key, pk in self.index
+                if name in key and not key.startswith(name)
+            ][:limit - len(found)]
+        if len(found) < limit and len(name) >= TYPO_MIN_LENGTH:
+            found_ids = {item['id'] for item in found}
+            start, end = self.get_prefix_range(name[:TYPO_PREFIX_LENGTH])
+            similar = []
+            for key, pk in self.index[start:end]:
+                if pk in found_ids:
+                    continue
+                ratio = self.get_similarity(name, key)
+                if ratio >= TYPO_MIN_RATIO:
+                    similar.append((ratio, pk))
+            similar.sort(key=itemgetter(0), reverse=True)
+            found += [self.by_id[pk] for _, pk in similar[:limit - len(found)]]
+        return found
+
+    @staticmethod
+    def get_similarity(name, key):
+        return max(
+            SequenceMatcher(None, name, key[:length]).ratio()
+            for length in range(len(name) - 1, len(name) + 2)
+        )
+
+
+tag_catalogue = TagCatalogue(Tag, TagSerialiser)
+ingredient_catalogue = IngredientCatalogue(Ingredient, IngredientSerializer)
+recipe_search_index = RecipeSearchIndex(Recipe)
+recipe_ingredient_index = RecipeIngredientIndex(Recipe)
+recommendation_model = RecommendationModel()
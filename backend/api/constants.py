@@ -7,3 +7,27 @@ MIN_VALUE = 1
 MAX_VALUE = 32767
 MAX_LENGTH_NAME = 150
 MAX_LENGTH_EMAIL = 254
+AUTOCOMPLETE_LIMIT = 10
+MAX_AUTOCOMPLETE_LIMIT = 50
+TYPO_MIN_LENGTH = 4
+TYPO_PREFIX_LENGTH = 1
+TYPO_MIN_RATIO = 0.8
+SHORT_LINK_TIMEOUT = 60 * 60 * 24 * 30
+SHORT_LINK_MISSING_TIMEOUT = 60
+MAX_IMAGE_SIZE = 5 * 1024 * 1024
+MAX_IMAGE_PIXELS = 4096 * 4096
+BASE64_CHUNK_SIZE = 64 * 1024
+THUMBNAIL_SIZE = (600, 600)
+THUMBNAIL_QUALITY = 80
+N_PLUS_ONE_THRESHOLD = 5
+MAX_BATCH_SIZE = 100
+RECOMMENDATION_TOP_K = 50
+RECOMMENDATION_CANDIDATES = 200
+RECOMMENDATION_MAX_FEATURE_RECIPES = 1000
+RECOMMENDATION_POPULAR = 500
+RECOMMENDATION_SEEDS = 50
+FEED_BATCH_SIZE = 1000
+MAX_LENGTH_LABEL = 100
+SHOPPING_LIST_TIMEOUT = 60 * 60 * 24
+CATALOGUE_CHANGES_LIMIT = 1000
+SEARCH_FALLBACK_LIMIT = 250
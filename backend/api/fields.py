@@ -0,0 +1,129 @@
+import base64
+import binascii
+import io
+import uuid
+
+import filetype
+from django.conf import settings
+from django.core.files.uploadedfile import (
+    InMemoryUploadedFile, TemporaryUploadedFile
+)
+from drf_extra_fields.fields import Base64ImageField
+from PIL import Image
+from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+from .constants import BASE64_CHUNK_SIZE, MAX_IMAGE_PIXELS, MAX_IMAGE_SIZE
+
+
+def decode_base64(encoded, file):
+    for start in range(0, len(encoded), BASE64_CHUNK_SIZE):
+        file.write(base64.b64decode(
+            encoded[start:start + BASE64_CHUNK_SIZE], validate=True
+        ))
+    file.seek(0)
+    return file
+
+
+def get_in_bulk(queryset, pks):
+    instances = queryset.in_bulk(pks)
+    missing = [pk for pk in dict.fromkeys(pks) if pk not in instances]
+    if missing:
+        message = serializers.PrimaryKeyRelatedField.default_error_messages[
+            'does_not_exist'
+        ]
+        raise serializers.ValidationError(
+            [message.format(pk_value=pk) for pk in missing],
+            code='does_not_exist'
+        )
+    return instances
+
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        pks = []
+        for pk in data:
+            try:
+                if isinstance(pk, bool):
+                    raise TypeError
+                pks.append(int(pk))
+            except (TypeError, ValueError):
+                self.child_relation.fail(
+                    'incorrect_type', data_type=type(pk).__name__
+                )
+        instances = get_in_bulk(self.child_relation.get_queryset(), pks)
+        return [instances[pk] for pk in pks]
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
+
+class StreamingBase64ImageField(Base64ImageField):
+
+    def to_internal_value(self, base64_data):
+        if base64_data in self.EMPTY_VALUES:
+            return None
+        if not isinstance(base64_data, str):
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        header, _, encoded = base64_data.rpartition(';base64,')
+        encoded = ''.join(encoded.split())
+        size = len(encoded) // 4 * 3
+        if size > MAX_IMAGE_SIZE:
+            raise serializers.ValidationError(
+                'Размер изображения не должен превышать '
+                f'{MAX_IMAGE_SIZE // (1024 * 1024)} МБ'
+            )
+        content_type = (
+            header.replace('data:', '')
+            if self.trust_provided_content_type else None
+        )
+        name = str(uuid.uuid4())
+        if size > settings.FILE_UPLOAD_MAX_MEMORY_SIZE:
+            file = TemporaryUploadedFile(name, content_type, 0, None)
+        else:
+            file = InMemoryUploadedFile(
+                io.BytesIO(), None, name, content_type, 0, None
+            )
+        try:
+            extension = self.read_image(encoded, file)
+        except serializers.ValidationError:
+            file.close()
+            raise
+        file.seek(0, 2)
+        file.size = file.tell()
+        file.seek(0)
+        file.name = f'{name}.{extension}'
+        return file
+
+    def read_image(self, encoded, file):
+        try:
+            decode_base64(encoded, file)
+        except (binascii.Error, ValueError):
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        extension = filetype.guess_extension(file.read(261))
+        file.seek(0)
+        if extension not in self.ALLOWED_TYPES:
+            raise serializers.ValidationError(self.INVALID_TYPE_MESSAGE)
+        try:
+            with Image.open(file) as image:
+                width, height = image.size
+        except OSError:
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        if width * height > MAX_IMAGE_PIXELS:
+            raise serializers.ValidationError(
+                'Разрешение изображения слишком большое'
+            )
+        return extension
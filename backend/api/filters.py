@@ -1,14 +1,23 @@
+from django.db.models import Exists, OuterRef
 from django_filters.rest_framework import filters, FilterSet
 
-from recipes.models import (Ingredient,
-                            Recipe, Tag)
+from recipes.models import Recipe
+from recipes.search import search_recipes
+from .catalogue import recipe_search_index, tag_catalogue
+
+RECIPE_ORDERINGS = {
+    'popular': ('-favorites_count', '-pub_date', '-id'),
+}
+
+
+def get_tag_choices():
+    return [(slug, slug) for slug in tag_catalogue.refresh().by_slug]
 
 
 class RecipeFilter(FilterSet):
-    tags = filters.ModelMultipleChoiceFilter(
-        queryset=Tag.objects.all(),
-        field_name='tags__slug',
-        to_field_name='slug',
+    tags = filters.MultipleChoiceFilter(
+        choices=get_tag_choices,
+        method='get_tags'
     )
     is_favorited = filters.BooleanFilter(
         method='get_is_favorited'
@@ -16,10 +25,31 @@ class RecipeFilter(FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method='get_is_in_shopping_cart'
     )
+    search = filters.CharFilter(
+        method='get_search'
+    )
+    ordering = filters.ChoiceFilter(
+        choices=[(name, name) for name in RECIPE_ORDERINGS],
+        method='get_ordering'
+    )
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart')
+        fields = (
+            'author', 'tags', 'is_favorited', 'is_in_shopping_cart', 'search',
+            'ordering'
+        )
+
+    def get_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        by_slug = tag_catalogue.refresh().by_slug
+        return queryset.filter(Exists(
+            Recipe.tags.through.objects.filter(
+                recipe=OuterRef('pk'),
+                tag_id__in=[by_slug[slug]['id'] for slug in value]
+            )
+        ))
 
     def get_is_favorited(self, queryset, name, value):
         if self.request.user.is_authenticated and value:
@@ -31,10 +61,8 @@ class RecipeFilter(FilterSet):
             return queryset.filter(shoppingcarts__user=self.request.user)
         return queryset
 
+    def get_search(self, queryset, name, value):
+        return search_recipes(queryset, value, recipe_search_index)
 
-class IngredientFilter(FilterSet):
-    name = filters.CharFilter(lookup_expr='istartswith')
-
-    class Meta:
-        model = Ingredient
-        fields = ('name', )
+    def get_ordering(self, queryset, name, value):
+        return queryset.order_by(*RECIPE_ORDERINGS[value])
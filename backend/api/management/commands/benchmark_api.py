@@ -0,0 +1,120 @@
+import json
+import logging
+import random
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (override_settings, setup_test_environment,
+                               teardown_test_environment)
+
+from api.benchmark import (BenchmarkRunner, get_dataset_size, get_scenarios,
+                           seed_dataset)
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет тестовую базу и замеряет количество SQL-запросов, '
+        'задержку и пиковую память для эндпоинтов API.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--recipes', type=int, default=20000)
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Количество замеров задержки на эндпоинт',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--output', type=Path, default=Path('benchmark.json'),
+            help='Файл для результатов в формате JSON',
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=0,
+            help=(
+                'Количество параллельных клиентов для сравнения '
+                'пропускной способности WSGI и ASGI'
+            ),
+        )
+        parser.add_argument(
+            '--max-p95-ms', type=float, default=None,
+            help='Допустимый 95-й перцентиль задержки для каждого эндпоинта',
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 3 or options['recipes'] < 2:
+            raise CommandError('Нужно хотя бы 3 пользователя и 2 рецепта')
+        if options['repeat'] < 1:
+            raise CommandError('--repeat должен быть больше 0')
+        if options['concurrency'] < 0:
+            raise CommandError('--concurrency не может быть отрицательным')
+
+        logging.getLogger('api.metrics').setLevel(logging.WARNING)
+        old_name = connection.settings_dict['NAME']
+        setup_test_environment()
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with TemporaryDirectory() as media_root, override_settings(
+                MEDIA_ROOT=media_root, IMAGE_WORKERS=0,
+                RECOMMENDATIONS_PATH=Path(media_root) / 'recommendations.bin'
+            ):
+                rng = random.Random(options['seed'])
+                user = seed_dataset(
+                    options['users'], options['recipes'], rng
+                )
+                dataset = get_dataset_size()
+                runner = BenchmarkRunner(
+                    user, options['repeat'], options['concurrency']
+                )
+                results = [
+                    runner.run(scenario)
+                    for scenario in get_scenarios(user, rng)
+                ]
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        for result in results:
+            result['passed'] = (
+                result['status'] < 400
+                and result['queries'] <= result['max_queries']
+                and (
+                    options['max_p95_ms'] is None
+                    or result['p95_ms'] <= options['max_p95_ms']
+                )
+            )
+            line = (
+                '{method:6} {path:60} {status} queries={queries}/'
+                '{max_queries} p50={p50_ms}ms p95={p95_ms}ms '
+                'peak={peak_memory_kb}KB'
+            )
+            if 'concurrency' in result:
+                line += ' wsgi={wsgi_rps}rps asgi={asgi_rps}rps'
+            self.stdout.write(
+                line.format(**result),
+                self.style.SUCCESS if result['passed'] else self.style.ERROR
+            )
+        failed = [result for result in results if not result['passed']]
+        options['output'].write_text(json.dumps(
+            {
+                'dataset': dataset,
+                'repeat': options['repeat'],
+                'concurrency': options['concurrency'],
+                'max_p95_ms': options['max_p95_ms'],
+                'passed': not failed,
+                'results': results,
+            },
+            ensure_ascii=False, indent=2
+        ), encoding='utf-8')
+        if failed:
+            raise CommandError(
+                'Превышены пороги: ' + ', '.join(
+                    f'{result["method"]} {result["path"]}'
+                    for result in failed
+                )
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Результаты записаны в {options["output"]}'
+        ))
@@ -0,0 +1,247 @@
+import asyncio
+import json
+import logging
+import re
+import time
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from threading import Lock
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse
+
+from .constants import N_PLUS_ONE_THRESHOLD
+
+UNMATCHED_ROUTE = 'unmatched'
+IN_LIST_RE = re.compile(r'IN \((?:%s, )*%s\)')
+METRICS = (
+    ('requests', 'foodgram_http_requests_total', 'counter',
+     'Количество запросов'),
+    ('server_errors', 'foodgram_http_server_errors_total', 'counter',
+     'Количество ответов с кодом 5xx'),
+    ('duration', 'foodgram_http_request_duration_seconds_sum', 'counter',
+     'Суммарное время обработки запросов'),
+    ('db_duration', 'foodgram_db_duration_seconds_sum', 'counter',
+     'Суммарное время SQL-запросов'),
+    ('app_duration', 'foodgram_app_duration_seconds_sum', 'counter',
+     'Суммарное время представлений без учета SQL (сериализация)'),
+    ('render_duration', 'foodgram_render_duration_seconds_sum', 'counter',
+     'Суммарное время рендеринга ответов'),
+    ('queries', 'foodgram_db_queries_total', 'counter',
+     'Количество SQL-запросов'),
+    ('n_plus_one', 'foodgram_n_plus_one_requests_total', 'counter',
+     'Количество запросов с повторяющимся SQL'),
+)
+
+logger = logging.getLogger(__name__)
+
+
+def get_fingerprint(sql):
+    return IN_LIST_RE.sub('IN (...)', sql)
+
+
+class QueryCollector:
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.fingerprints[get_fingerprint(sql)] += 1
+
+    def get_repeated(self):
+        return [
+            {'sql': sql, 'count': count}
+            for sql, count in self.fingerprints.most_common()
+            if count >= N_PLUS_ONE_THRESHOLD
+        ]
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self.lock = Lock()
+        self.routes = defaultdict(Counter)
+
+    def record(self, route, method, status, timings, queries, n_plus_one):
+        with self.lock:
+            stats = self.routes[route, method]
+            stats['requests'] += 1
+            stats['server_errors'] += status >= 500
+            stats['duration'] += timings['total']
+            stats['db_duration'] += timings['db']
+            stats['app_duration'] += timings['app']
+            stats['render_duration'] += timings['render']
+            stats['queries'] += queries
+            stats['n_plus_one'] += bool(n_plus_one)
+
+    def render(self):
+        with self.lock:
+            routes = {key: dict(stats) for key, stats in self.routes.items()}
+        lines = []
+        for key, name, metric_type, description in METRICS:
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            for (route, method), stats in sorted(routes.items()):
+                lines.append(
+                    f'{name}{{route="{route}",method="{method}"}} '
+                    f'{stats.get(key, 0):g}'
+                )
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+current_collector = ContextVar('current_collector', default=None)
+
+
+def collect_queries(execute, sql, params, many, context):
+    collector = current_collector.get()
+    if collector is None:
+        return execute(sql, params, many, context)
+    return collector(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_collector(sender, connection, **kwargs):
+    if collect_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, collect_queries)
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        for alias in connections:
+            install_query_collector(None, connections[alias])
+        collector = QueryCollector()
+        request.metrics = {}
+        started = time.perf_counter()
+        token = current_collector.set(collector)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_collector.reset(token)
+        return self.finish(request, response, collector, started)
+
+    async def __acall__(self, request):
+        collector = QueryCollector()
+        request.metrics = {}
+        started = time.perf_counter()
+        token = current_collector.set(collector)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_collector.reset(token)
+        return self.finish(request, response, collector, started)
+
+    def finish(self, request, response, collector, started):
+        timings = self.get_timings(request, collector, started)
+        response['Server-Timing'] = ', '.join(
+            f'{name};dur={duration * 1000:.1f}'
+            for name, duration in timings.items()
+        )
+        if response.streaming:
+            response.streaming_content = self.stream(
+                request, response, iter(response.streaming_content),
+                collector, started
+            )
+        else:
+            self.report(request, response, collector, timings)
+        return response
+
+    def stream(self, request, response, content, collector, started):
+        try:
+            while True:
+                token = current_collector.set(collector)
+                try:
+                    chunk = next(content, None)
+                finally:
+                    current_collector.reset(token)
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            self.report(
+                request, response, collector,
+                self.get_timings(request, collector, started)
+            )
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics['view_started'] = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        request.metrics['view_finished'] = time.perf_counter()
+
+        def finish_render(response):
+            request.metrics['render_finished'] = time.perf_counter()
+
+        response.add_post_render_callback(finish_render)
+        return response
+
+    def get_timings(self, request, collector, started):
+        finished = time.perf_counter()
+        view_started = request.metrics.get('view_started', finished)
+        view_finished = request.metrics.get('view_finished', finished)
+        render_finished = request.metrics.get(
+            'render_finished', view_finished
+        )
+        return {
+            'db': collector.duration,
+            'app': max(
+                view_finished - view_started - collector.duration, 0
+            ),
+            'render': render_finished - view_finished,
+            'total': finished - started,
+        }
+
+    def report(self, request, response, collector, timings):
+        match = request.resolver_match
+        route = match.url_name if match and match.url_name else (
+            UNMATCHED_ROUTE
+        )
+        n_plus_one = collector.get_repeated()
+        registry.record(
+            route, request.method, response.status_code, timings,
+            collector.count, n_plus_one
+        )
+        record = {
+            'route': route,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': collector.count,
+            **{
+                f'{name}_ms': round(duration * 1000, 2)
+                for name, duration in timings.items()
+            },
+        }
+        if n_plus_one:
+            record['n_plus_one'] = n_plus_one
+            logger.warning(json.dumps(record, ensure_ascii=False))
+        else:
+            logger.info(json.dumps(record, ensure_ascii=False))
+
+
+def metrics_view(request):
+    return HttpResponse(
+        registry.render(), content_type='text/plain; version=0.0.4'
+    )
@@ -1,8 +1,114 @@
+import hashlib
+import json
+
 from django.conf import settings
-from rest_framework.pagination import PageNumberPagination
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connection
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+COUNT_CACHE_KEY = 'pagination_count:{}'
+COUNT_EXACT = 'exact'
+COUNT_CACHED = 'cached'
+COUNT_ESTIMATED = 'estimated'
+
+
+def get_count_signature(queryset):
+    sql, params = queryset.values('pk').query.sql_with_params()
+    return hashlib.md5(f'{sql}{params!r}'.encode()).hexdigest()
+
+
+def get_cached_count(queryset):
+    key = COUNT_CACHE_KEY.format(get_count_signature(queryset))
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, settings.PAGINATION_COUNT_TIMEOUT)
+    return count
+
+
+def get_estimated_count(queryset):
+    if connection.vendor != 'postgresql':
+        return get_cached_count(queryset)
+    sql, params = queryset.values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    estimate = plan[0]['Plan']['Plan Rows']
+    if estimate < settings.PAGINATION_COUNT_ESTIMATE_THRESHOLD:
+        return get_cached_count(queryset)
+    return estimate
+
+
+COUNT_STRATEGIES = {
+    COUNT_EXACT: lambda queryset: queryset.count(),
+    COUNT_CACHED: get_cached_count,
+    COUNT_ESTIMATED: get_estimated_count,
+}
+
+
+class FoodgramPaginator(Paginator):
+
+    @cached_property
+    def count(self):
+        if not hasattr(self.object_list, 'query'):
+            return super().count
+        return COUNT_STRATEGIES[settings.PAGINATION_COUNT_STRATEGY](
+            self.object_list
+        )
+
+
+class FoodgramCursorPagination(CursorPagination):
+
+    page_size = settings.PAGE_SIZE
+    page_size_query_param = 'limit'
+
+    def __init__(self, ordering=None):
+        if ordering is not None:
+            self.ordering = ordering
 
 
 class FoodgramPagination(PageNumberPagination):
 
+    django_paginator_class = FoodgramPaginator
     page_size = settings.PAGE_SIZE
     page_size_query_param = 'limit'
+    cursor_ordering = None
+    cursor_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if (
+            self.cursor_ordering
+            and FoodgramCursorPagination.cursor_query_param
+            in request.query_params
+        ):
+            self.cursor_paginator = FoodgramCursorPagination(
+                self.cursor_ordering
+            )
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class RecipePagination(FoodgramPagination):
+
+    cursor_ordering = ('-pub_date', '-id')
+
+
+class SubscriptionPagination(FoodgramPagination):
+
+    cursor_ordering = ('username',)
+
+
+class FeedPagination(FoodgramCursorPagination):
+
+    ordering = ('-pub_date', '-recipe_id')
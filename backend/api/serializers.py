@@ -3,15 +3,18 @@ from django.forms import ValidationError
 from djoser.serializers import UserSerializer
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
-from drf_extra_fields.fields import Base64ImageField
 
 from recipes.models import (Favorite, Ingredient,
                             Recipe, RecipeIngredient,
                             ShoppingCart, Tag)
 from users.models import User, Subscription
 from .constants import (
-    MIN_VALUE, MAX_VALUE
+    MIN_VALUE, MAX_BATCH_SIZE, MAX_VALUE
 )
+from .fields import (
+    BulkPrimaryKeyRelatedField, StreamingBase64ImageField, get_in_bulk
+)
+from .services import get_subscribed_author_ids
 
 
 class UserGetSerializer(UserSerializer):
@@ -29,14 +32,12 @@ class UserGetSerializer(UserSerializer):
         return (
             request
             and request.user.is_authenticated
-            and obj.subscriptions_on_author.filter(
-                user=request.user
-            ).exists()
+            and obj.id in get_subscribed_author_ids(request)
         )
 
 
 class AvatarSerializer(serializers.ModelSerializer):
-    avatar = Base64ImageField(allow_null=True)
+    avatar = StreamingBase64ImageField(allow_null=True)
 
     class Meta:
         model = User
@@ -44,14 +45,15 @@ class AvatarSerializer(serializers.ModelSerializer):
 
 
 class RecipeSmallSerializer(serializers.ModelSerializer):
+    thumbnail = serializers.ImageField(source='preview', read_only=True)
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'thumbnail', 'cooking_time')
 
 
 class UserSubscribeRepresentSerializer(UserGetSerializer):
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.IntegerField(read_only=True, default=0)
 
     class Meta(UserSerializer.Meta):
         fields = UserSerializer.Meta.fields + (
@@ -67,14 +69,9 @@ class UserSubscribeRepresentSerializer(UserGetSerializer):
         )
 
     def get_recipes(self, obj):
-        request = self.context['request']
-        recipes_limit = request.query_params.get('recipes_limit')
-        recipes = obj.recipes.all()
-        if recipes_limit:
-            try:
-                recipes = recipes[:int(recipes_limit)]
-            except (ValueError, TypeError):
-                pass
+        recipes = getattr(obj, 'recipes_preview', None)
+        if recipes is None:
+            recipes = obj.recipes.all()[:self.context.get('recipes_limit')]
         return RecipeSmallSerializer(
             recipes, many=True,
             context=self.context
@@ -136,10 +133,21 @@ class IngredientGetSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
+class IngredientPostListSerializer(serializers.ListSerializer):
+
+    def to_internal_value(self, data):
+        ingredients = super().to_internal_value(data)
+        instances = get_in_bulk(
+            Ingredient.objects.all(),
+            [ingredient['id'] for ingredient in ingredients]
+        )
+        for ingredient in ingredients:
+            ingredient['id'] = instances[ingredient['id']]
+        return ingredients
+
+
 class IngredientPostSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all()
-    )
+    id = serializers.IntegerField()
     amount = serializers.IntegerField(
         max_value=MAX_VALUE,
         min_value=MIN_VALUE
@@ -148,6 +156,7 @@ class IngredientPostSerializer(serializers.ModelSerializer):
     class Meta:
         model = RecipeIngredient
         fields = ('id', 'amount')
+        list_serializer_class = IngredientPostListSerializer
 
 
 class RecipeGetSerializer(serializers.ModelSerializer):
@@ -157,45 +166,43 @@ class RecipeGetSerializer(serializers.ModelSerializer):
         many=True, read_only=True,
         source='recipeingredients'
     )
-    is_favorited = serializers.SerializerMethodField()
-    is_in_shopping_cart = serializers.SerializerMethodField()
-    image = Base64ImageField(required=False)
+    is_favorited = serializers.BooleanField(read_only=True, default=False)
+    is_in_shopping_cart = serializers.BooleanField(
+        read_only=True, default=False
+    )
+    image = StreamingBase64ImageField(required=False)
+    thumbnail = serializers.ImageField(source='preview', read_only=True)
 
     class Meta:
         model = Recipe
         fields = (
             'id', 'tags', 'author', 'ingredients',
             'is_favorited', 'is_in_shopping_cart', 'name',
-            'image', 'text', 'cooking_time'
+            'image', 'thumbnail', 'text', 'cooking_time'
         )
 
-    def get_is_favorited(self, obj):
-        request = self.context['request']
-        return (
-            request
-            and request.user.is_authenticated
-            and obj.favorites.filter(
-                user=request.user
-            ).exists()
-        )
 
-    def get_is_in_shopping_cart(self, obj):
-        request = self.context['request']
-        return (
-            request
-            and request.user.is_authenticated
-            and obj.shoppingcarts.filter(
-                user=request.user
-            ).exists()
-        )
+class RecipeMatchSerializer(RecipeGetSerializer):
+    coverage = serializers.FloatField(read_only=True)
+    missing = serializers.IntegerField(read_only=True)
+
+    class Meta(RecipeGetSerializer.Meta):
+        fields = RecipeGetSerializer.Meta.fields + ('coverage', 'missing')
+
+
+class RecipeRecommendationSerializer(RecipeGetSerializer):
+    score = serializers.FloatField(read_only=True)
+
+    class Meta(RecipeGetSerializer.Meta):
+        fields = RecipeGetSerializer.Meta.fields + ('score',)
 
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = BulkPrimaryKeyRelatedField(
         queryset=Tag.objects.all(), many=True
     )
     ingredients = IngredientPostSerializer(many=True)
-    image = Base64ImageField()
+    image = StreamingBase64ImageField()
 
     class Meta:
         model = Recipe
@@ -254,10 +261,43 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
         with transaction.atomic():
-            instance.ingredients.clear()
+            instance = super().update(instance, validated_data)
             instance.tags.set(tags)
-            self.add_ingredients_to_recipe(instance, ingredients)
-            return instance or super().update(instance, validated_data)
+            self.update_recipe_ingredients(instance, ingredients)
+        return instance
+
+    @staticmethod
+    def update_recipe_ingredients(recipe, ingredients):
+        amounts = {
+            ingredient['id'].pk: ingredient['amount']
+            for ingredient in ingredients
+        }
+        existing = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in RecipeIngredient.objects.filter(
+                recipe=recipe
+            )
+        }
+        changed = []
+        for ingredient_id, recipe_ingredient in existing.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and amount != recipe_ingredient.amount:
+                recipe_ingredient.amount = amount
+                changed.append(recipe_ingredient)
+        removed = existing.keys() - amounts.keys()
+        if removed:
+            RecipeIngredient.objects.filter(
+                recipe=recipe, ingredient_id__in=removed
+            ).delete()
+        RecipeIngredient.objects.bulk_update(changed, ('amount',))
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient_id=ingredient_id,
+                amount=amounts[ingredient_id],
+            )
+            for ingredient_id in amounts.keys() - existing.keys()
+        )
 
     @staticmethod
     def add_ingredients_to_recipe(recipe, ingredients):
@@ -271,6 +311,9 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         )
 
     def to_representation(self, instance):
+        instance = Recipe.objects.with_related().with_user_flags(
+            self.context['request'].user
+        ).get(pk=instance.pk)
         return RecipeGetSerializer(instance, context=self.context).data
 
 
@@ -311,3 +354,14 @@ class ShoppingCartSerializer(FavoriteAndShoppingCartSerializer):
     class Meta:
         model = ShoppingCart
         fields = '__all__'
+
+
+class RecipeBatchSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=MIN_VALUE),
+        allow_empty=False,
+        max_length=MAX_BATCH_SIZE
+    )
+
+    def validate_recipes(self, recipes):
+        return list(dict.fromkeys(recipes))
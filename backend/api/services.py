@@ -1,8 +1,82 @@
+import csv
 import datetime
+from html import escape
+from threading import local
+from uuid import uuid4
 
-from rest_framework import status
+import pdfkit
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q, Sum
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from rest_framework import serializers, status
 from rest_framework.response import Response
 
+from recipes.counters import batch_recipe_counters, recount_recipe_counters
+from recipes.models import Favorite, Recipe, RecipeIngredient, ShoppingCart
+from recipes.recommendations import INTERACTION_WEIGHTS
+from users.models import Subscription
+from .constants import RECOMMENDATION_SEEDS, SHOPPING_LIST_TIMEOUT
+
+SHOPPING_LIST_CACHE_KEY = 'shopping_list:{}:{}'
+SHOPPING_LIST_VERSION_KEY = 'shopping_list_version:{}'
+
+
+def get_positive_int_param(request, name, default=None, max_value=None):
+    value = request.query_params.get(name)
+    if value is None:
+        return default
+    try:
+        return serializers.IntegerField(
+            min_value=1, max_value=max_value
+        ).run_validation(value)
+    except serializers.ValidationError as error:
+        raise serializers.ValidationError({name: error.detail})
+
+
+def get_positive_int_list_param(request, name, max_length=None):
+    try:
+        return serializers.ListField(
+            child=serializers.IntegerField(min_value=1),
+            allow_empty=False, max_length=max_length
+        ).run_validation(request.query_params.getlist(name))
+    except serializers.ValidationError as error:
+        raise serializers.ValidationError({name: error.detail})
+
+
+def get_recipes_limit(request):
+    return get_positive_int_param(request, 'recipes_limit')
+
+
+def get_subscribed_author_ids(request):
+    if not hasattr(request, 'subscribed_author_ids'):
+        request.subscribed_author_ids = frozenset(
+            Subscription.objects.filter(
+                user=request.user
+            ).values_list('author_id', flat=True)
+        )
+    return request.subscribed_author_ids
+
+
+def get_catalogue_response(request, data, etag):
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = Response(data)
+    response['ETag'] = etag
+    return response
+
+
+def get_catalogue_json_response(request, data, etag):
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(
+            data, safe=False, json_dumps_params={'ensure_ascii': False}
+        )
+    response['ETag'] = etag
+    return response
+
 
 def create_model_recipe(request, instance, serializer):
     serializer = serializer(
@@ -10,7 +84,8 @@ def create_model_recipe(request, instance, serializer):
         context={'request': request}
     )
     serializer.is_valid(raise_exception=True)
-    serializer.save()
+    with transaction.atomic():
+        serializer.save()
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
@@ -26,20 +101,197 @@ def delete_model_recipe(request, model, instance, error_msg):
     )
 
 
+def create_model_recipes(request, model, recipe_ids):
+    added = dict(Recipe.objects.filter(pk__in=recipe_ids).annotate(
+        added=Exists(model.objects.filter(
+            user=request.user, recipe=OuterRef('pk')
+        ))
+    ).values_list('pk', 'added'))
+    created = [
+        recipe_id for recipe_id, exists in added.items() if not exists
+    ]
+    if created:
+        with transaction.atomic():
+            model.objects.bulk_create(
+                (
+                    model(user=request.user, recipe_id=recipe_id)
+                    for recipe_id in created
+                ),
+                ignore_conflicts=True
+            )
+            recount_recipe_counters(
+                Recipe.objects.filter(pk__in=created), (model,)
+            )
+            if model is ShoppingCart:
+                shopping_list_invalidation.add(user_ids=(request.user.id,))
+    return Response({'results': [
+        {
+            'id': recipe_id,
+            'status': (
+                'not_found' if recipe_id not in added
+                else 'exists' if added[recipe_id]
+                else 'created'
+            )
+        }
+        for recipe_id in recipe_ids
+    ]})
+
+
+def delete_model_recipes(request, model, recipe_ids):
+    queryset = model.objects.filter(
+        user=request.user, recipe_id__in=recipe_ids
+    )
+    deleted = set(queryset.values_list('recipe_id', flat=True))
+    if deleted:
+        with transaction.atomic(), batch_recipe_counters(deleted, (model,)):
+            queryset.filter(recipe_id__in=deleted).delete()
+    return Response({'results': [
+        {
+            'id': recipe_id,
+            'status': 'deleted' if recipe_id in deleted else 'not_found'
+        }
+        for recipe_id in recipe_ids
+    ]})
+
+
+def get_recommendation_seeds(user):
+    seeds = {}
+    exclude = set()
+    for model, kind in ((ShoppingCart, 'cart'), (Favorite, 'favorite')):
+        recipe_ids = list(model.objects.filter(user=user).order_by(
+            '-id'
+        ).values_list('recipe_id', flat=True))
+        exclude.update(recipe_ids)
+        seeds.update(dict.fromkeys(
+            recipe_ids[:RECOMMENDATION_SEEDS], INTERACTION_WEIGHTS[kind]
+        ))
+    return seeds, exclude
+
+
+def get_shopping_list_version(user):
+    key = SHOPPING_LIST_VERSION_KEY.format(user.id)
+    version = cache.get(key)
+    if version is None:
+        version = {
+            'etag': uuid4().hex,
+            'last_modified': timezone.now().replace(microsecond=0),
+        }
+        if not cache.add(key, version, SHOPPING_LIST_TIMEOUT):
+            version = cache.get(key, version)
+    return version
+
+
+def cache_shopping_list(cache_key, cart_recipes, ingredients):
+    cached = []
+    for ingredient in ingredients:
+        cached.append(ingredient)
+        yield ingredient
+    cache.set(cache_key, (cart_recipes, cached), SHOPPING_LIST_TIMEOUT)
+
+
+def get_shopping_list(user, version):
+    cache_key = SHOPPING_LIST_CACHE_KEY.format(user.id, version['etag'])
+    shopping_list = cache.get(cache_key)
+    if shopping_list is not None:
+        return shopping_list
+    cart_recipes = list(Recipe.objects.filter(
+        shoppingcarts__user=user
+    ).values_list('name', flat=True))
+    ingredients = RecipeIngredient.objects.filter(
+        recipe__shoppingcarts__user=user
+    ).values(
+        'ingredient__name', 'ingredient__measurement_unit'
+    ).annotate(
+        ingredient_amount=Sum('amount')
+    ).order_by('ingredient__name').iterator()
+    return cart_recipes, cache_shopping_list(
+        cache_key, cart_recipes, ingredients
+    )
+
+
+def invalidate_shopping_lists(user_ids):
+    cache.delete_many(
+        [SHOPPING_LIST_VERSION_KEY.format(user_id) for user_id in user_ids]
+    )
+
+
+class ShoppingListInvalidation(local):
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.user_ids = set()
+        self.recipe_ids = set()
+        self.ingredient_ids = set()
+
+    def add(self, user_ids=(), recipe_ids=(), ingredient_ids=()):
+        self.user_ids.update(user_ids)
+        self.recipe_ids.update(recipe_ids)
+        self.ingredient_ids.update(ingredient_ids)
+        transaction.on_commit(self.flush)
+
+    def flush(self):
+        user_ids, recipe_ids, ingredient_ids = (
+            self.user_ids, self.recipe_ids, self.ingredient_ids
+        )
+        self.reset()
+        if recipe_ids or ingredient_ids:
+            user_ids |= set(ShoppingCart.objects.filter(
+                Q(recipe_id__in=recipe_ids)
+                | Q(recipe__recipeingredients__ingredient_id__in=(
+                    ingredient_ids
+                ))
+            ).values_list('user_id', flat=True))
+        if user_ids:
+            invalidate_shopping_lists(user_ids)
+
+
+shopping_list_invalidation = ShoppingListInvalidation()
+
+
 def generate_shopping_list(ingredients, cart_recipes):
     today = datetime.datetime.now().strftime('%d-%m-%Y')
-    ingredients_info = [
-        f'{i}. {ingredient["ingredient__name"].capitalize()} '
-        f'({ingredient["ingredient__measurement_unit"]}) - '
-        f'{ingredient["ingredient_amount"]}'
-        for i, ingredient in enumerate(ingredients, start=1)
-    ]
-    recipe_names = [f' - {recipe.name}' for recipe in cart_recipes]
-    shopping_list = '\n'.join([
-        f'Дата создания списка: {today}',
-        'Рецепты:',
-        *recipe_names,
-        'Продукты:',
-        *ingredients_info
-    ])
-    return shopping_list
+    yield f'Дата создания списка: {today}\n'
+    yield 'Рецепты:\n'
+    for recipe_name in cart_recipes:
+        yield f' - {recipe_name}\n'
+    yield 'Продукты:\n'
+    for i, ingredient in enumerate(ingredients, start=1):
+        yield (
+            f'{i}. {ingredient["ingredient__name"].capitalize()} '
+            f'({ingredient["ingredient__measurement_unit"]}) - '
+            f'{ingredient["ingredient_amount"]}\n'
+        )
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def generate_shopping_list_csv(ingredients, cart_recipes):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('Продукт', 'Единица измерения', 'Количество'))
+    for ingredient in ingredients:
+        yield writer.writerow((
+            ingredient['ingredient__name'].capitalize(),
+            ingredient['ingredient__measurement_unit'],
+            ingredient['ingredient_amount'],
+        ))
+
+
+def generate_shopping_list_pdf(ingredients, cart_recipes):
+    text = ''.join(generate_shopping_list(ingredients, cart_recipes))
+    return [pdfkit.from_string(
+        f'<html><head><meta charset="utf-8"></head>'
+        f'<body><pre>{escape(text)}</pre></body></html>',
+        False
+    )]
+
+
+SHOPPING_LIST_FORMATS = {
+    'txt': (generate_shopping_list, 'text/plain; charset=utf-8'),
+    'csv': (generate_shopping_list_csv, 'text/csv; charset=utf-8'),
+    'pdf': (generate_shopping_list_pdf, 'application/pdf'),
+}
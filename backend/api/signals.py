@@ -0,0 +1,30 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .services import shopping_list_invalidation
+from recipes.models import Ingredient, Recipe, RecipeIngredient, ShoppingCart
+
+
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def invalidate_user_shopping_list(sender, instance, **kwargs):
+    shopping_list_invalidation.add(user_ids=(instance.user_id,))
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def invalidate_recipe_ingredient_shopping_lists(sender, instance, **kwargs):
+    shopping_list_invalidation.add(recipe_ids=(instance.recipe_id,))
+
+
+@receiver(post_save, sender=Recipe)
+def invalidate_recipe_shopping_lists(sender, instance, created, **kwargs):
+    if not created:
+        shopping_list_invalidation.add(recipe_ids=(instance.pk,))
+
+
+@receiver(post_save, sender=Ingredient)
+def invalidate_ingredient_shopping_lists(sender, instance, created,
+                                         **kwargs):
+    if not created:
+        shopping_list_invalidation.add(ingredient_ids=(instance.pk,))
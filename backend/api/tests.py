@@ -0,0 +1,843 @@
+import io
+import json
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock, skipIf, skipUnless
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework import serializers
+from rest_framework.test import APITestCase
+
+from .fields import BulkPrimaryKeyRelatedField
+from .catalogue import (
+    ingredient_catalogue, recipe_ingredient_index, recipe_search_index,
+    tag_catalogue
+)
+from recipes.models import (
+    FeedEntry, Favorite, Ingredient, Recipe, RecipeIngredient, ShoppingCart,
+    Tag
+)
+from recipes.importers import IngredientImporter
+from recipes.services import encode_base62
+from users.models import Subscription, User
+
+IMAGE_NAME = 'recipes/images/test.png'
+
+
+def create_image(name, color='red'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), color).save(buffer, 'PNG')
+    return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+class ApiTestCase(APITestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, media_root)
+        media_settings = override_settings(
+            MEDIA_ROOT=media_root, IMAGE_WORKERS=0
+        )
+        media_settings.enable()
+        cls.addClassCleanup(media_settings.disable)
+        super().setUpClass()
+        create_image(IMAGE_NAME)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='user', email='user@example.com',
+            first_name='Имя', last_name='Фамилия', password='password'
+        )
+        cls.tags = [
+            Tag.objects.create(name=f'Тег {number}', slug=f'tag_{number}')
+            for number in range(2)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г'
+            )
+            for number in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        for catalogue in (tag_catalogue, ingredient_catalogue):
+            catalogue.current = None
+        for index in (recipe_search_index, recipe_ingredient_index):
+            index.version = None
+        self.client.force_authenticate(self.user)
+
+    def create_author(self, number):
+        return User.objects.create_user(
+            username=f'author_{number}', email=f'author_{number}@example.com',
+            first_name='Имя', last_name='Фамилия', password='password'
+        )
+
+    def create_recipes(self, author, count):
+        recipes = []
+        for number in range(count):
+            recipe = Recipe.objects.create(
+                author=author, name=f'Рецепт {number}', text='Описание',
+                cooking_time=10, image=IMAGE_NAME
+            )
+            recipe.tags.set(self.tags)
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient, amount=number + 1
+                )
+                for ingredient in self.ingredients
+            )
+            recipes.append(recipe)
+        return recipes
+
+    def count_queries(self, path):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+
+class RecipeQueriesTest(ApiTestCase):
+
+    def test_list_queries_do_not_depend_on_page_size(self):
+        author = self.create_author(0)
+        self.create_recipes(author, 2)
+        small_page = self.count_queries('/api/recipes/?limit=2')
+        self.create_recipes(author, 10)
+        with self.assertNumQueries(small_page):
+            response = self.client.get('/api/recipes/?limit=12')
+        self.assertEqual(len(response.data['results']), 12)
+
+    def test_detail_queries(self):
+        recipe, = self.create_recipes(self.create_author(0), 1)
+        with self.assertNumQueries(4):
+            response = self.client.get(f'/api/recipes/{recipe.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['ingredients']), 3)
+
+    def test_anonymous_list_queries_do_not_depend_on_page_size(self):
+        self.client.force_authenticate(None)
+        author = self.create_author(0)
+        self.create_recipes(author, 2)
+        small_page = self.count_queries('/api/recipes/?limit=2')
+        self.create_recipes(author, 10)
+        with self.assertNumQueries(small_page):
+            response = self.client.get('/api/recipes/?limit=12')
+        self.assertEqual(len(response.data['results']), 12)
+        self.assertFalse(any(
+            recipe['is_favorited'] for recipe in response.data['results']
+        ))
+
+
+class RecipePermissionsTest(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.recipe, = self.create_recipes(self.create_author(0), 1)
+        self.path = f'/api/recipes/{self.recipe.pk}/'
+
+    def test_non_author_cannot_update_recipe(self):
+        response = self.client.patch(
+            self.path, {'name': 'Чужое название'}, format='json'
+        )
+        self.assertEqual(response.status_code, 403)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.name, 'Рецепт 0')
+
+    def test_non_author_cannot_delete_recipe(self):
+        response = self.client.delete(self.path)
+        self.assertEqual(response.status_code, 403)
+        self.assertTrue(Recipe.objects.filter(pk=self.recipe.pk).exists())
+
+    def test_anonymous_can_read_recipes(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(self.path).status_code, 200)
+        self.assertEqual(self.client.get('/api/recipes/').status_code, 200)
+        self.assertEqual(self.client.delete(self.path).status_code, 401)
+
+
+class SubscriptionQueriesTest(ApiTestCase):
+
+    def subscribe(self, start, stop):
+        for number in range(start, stop):
+            author = self.create_author(number)
+            self.create_recipes(author, 3)
+            Subscription.objects.create(user=self.user, author=author)
+
+    def test_queries_do_not_depend_on_authors(self):
+        path = '/api/users/subscriptions/?limit=100&recipes_limit=2'
+        self.subscribe(0, 2)
+        few_authors = self.count_queries(path)
+        self.subscribe(2, 10)
+        with self.assertNumQueries(few_authors):
+            response = self.client.get(path)
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertEqual(len(response.data['results'][0]['recipes']), 2)
+
+
+class BatchTest(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.recipes = self.create_recipes(self.create_author(0), 3)
+        self.ids = [recipe.pk for recipe in self.recipes]
+        self.missing_id = max(self.ids) + 1
+
+    def get_statuses(self, response):
+        self.assertEqual(response.status_code, 200)
+        return {
+            result['id']: result['status']
+            for result in response.data['results']
+        }
+
+    def get_counters(self, field):
+        return dict(Recipe.objects.values_list('pk', field))
+
+    def check_batch(self, path, model, field):
+        model.objects.create(user=self.user, recipe=self.recipes[0])
+        response = self.client.post(
+            path, {'recipes': self.ids + [self.missing_id]}, format='json'
+        )
+        self.assertEqual(self.get_statuses(response), {
+            self.ids[0]: 'exists',
+            self.ids[1]: 'created',
+            self.ids[2]: 'created',
+            self.missing_id: 'not_found',
+        })
+        self.assertEqual(model.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(self.get_counters(field), dict.fromkeys(self.ids, 1))
+        response = self.client.delete(
+            path, {'recipes': self.ids[:2] + [self.missing_id]},
+            format='json'
+        )
+        self.assertEqual(self.get_statuses(response), {
+            self.ids[0]: 'deleted',
+            self.ids[1]: 'deleted',
+            self.missing_id: 'not_found',
+        })
+        self.assertEqual(
+            list(model.objects.filter(user=self.user).values_list(
+                'recipe_id', flat=True
+            )),
+            [self.ids[2]]
+        )
+        self.assertEqual(self.get_counters(field), {
+            self.ids[0]: 0, self.ids[1]: 0, self.ids[2]: 1
+        })
+
+    def test_favorite_batch(self):
+        self.check_batch(
+            '/api/recipes/favorite/batch/', Favorite, 'favorites_count'
+        )
+
+    def test_shopping_cart_batch(self):
+        self.check_batch(
+            '/api/recipes/shopping_cart/batch/', ShoppingCart,
+            'shopping_carts_count'
+        )
+
+    def test_batch_requires_authentication(self):
+        self.client.force_authenticate(None)
+        response = self.client.post(
+            '/api/recipes/favorite/batch/', {'recipes': self.ids},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 401)
+
+
+class ShoppingListCacheTest(ApiTestCase):
+    path = '/api/recipes/download_shopping_cart/'
+
+    def setUp(self):
+        super().setUp()
+        self.first, self.second = self.create_recipes(
+            self.create_author(0), 2
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            ShoppingCart.objects.create(user=self.user, recipe=self.first)
+
+    def download(self, **headers):
+        response = self.client.get(self.path, **headers)
+        content = b''.join(getattr(response, 'streaming_content', ()))
+        return response, content.decode()
+
+    def test_etag_and_not_modified(self):
+        response, content = self.download()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Ингредиент 0', content)
+        with self.assertNumQueries(0):
+            cached, cached_content = self.download()
+        self.assertEqual(cached['ETag'], response['ETag'])
+        self.assertEqual(cached_content, content)
+        with self.assertNumQueries(0):
+            response, _ = self.download(HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_cart_change_invalidates_list(self):
+        response, content = self.download()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                f'/api/recipes/{self.second.pk}/shopping_cart/'
+            )
+        changed, changed_content = self.download(
+            HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+        self.assertNotEqual(changed_content, content)
+        with self.captureOnCommitCallbacks(execute=True):
+            ShoppingCart.objects.filter(recipe=self.second).delete()
+        _, restored = self.download()
+        self.assertEqual(restored, content)
+
+    def test_ingredient_change_invalidates_list(self):
+        response, _ = self.download()
+        ingredient = self.ingredients[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            ingredient.name = 'Переименованный'
+            ingredient.save()
+        changed, content = self.download(
+            HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(changed.status_code, 200)
+        self.assertIn('Переименованный', content)
+        self.assertNotIn('Ингредиент 0', content)
+
+    def test_amount_change_invalidates_list(self):
+        response, _ = self.download()
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe_ingredient = RecipeIngredient.objects.get(
+                recipe=self.first, ingredient=self.ingredients[1]
+            )
+            recipe_ingredient.amount = 500
+            recipe_ingredient.save()
+        changed, content = self.download(
+            HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(changed.status_code, 200)
+        self.assertIn('500', content)
+
+
+class CatalogueTest(ApiTestCase):
+
+    def test_tags(self):
+        response = self.client.get('/api/tags/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [tag['slug'] for tag in response.json()], ['tag_0', 'tag_1']
+        )
+        response = self.client.get(
+            '/api/tags/', HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(f'/api/tags/{self.tags[1].pk}/')
+        self.assertEqual(response.json()['name'], 'Тег 1')
+        self.assertEqual(self.client.get('/api/tags/0/').status_code, 404)
+        self.assertEqual(self.client.post('/api/tags/').status_code, 405)
+
+    def test_ingredient_search(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(name='Ёжевика', measurement_unit='г')
+        response = self.client.get('/api/ingredients/?name=еж')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [ingredient['name'] for ingredient in response.json()],
+            ['Ёжевика']
+        )
+        response = self.client.get('/api/ingredients/')
+        self.assertEqual(len(response.json()), 4)
+
+    def test_refresh_swaps_catalogue(self):
+        catalogue = tag_catalogue.refresh()
+        self.assertIs(tag_catalogue.refresh(), catalogue)
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name='Тег 2', slug='tag_2')
+        refreshed = tag_catalogue.refresh()
+        self.assertIsNot(refreshed, catalogue)
+        self.assertEqual(len(catalogue.items), 2)
+        self.assertNotIn('tag_2', catalogue.by_slug)
+        self.assertEqual(len(refreshed.items), 3)
+        self.assertIn('tag_2', refreshed.by_slug)
+
+
+class SearchTest(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.author = self.create_author(0)
+        self.client.force_authenticate(self.author)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.borsch, self.soup = self.create_recipes(self.author, 2)
+            self.borsch.name = 'Борщ'
+            self.borsch.save()
+            self.soup.text = 'Почти как борщ'
+            self.soup.save()
+
+    def search(self, value):
+        response = self.client.get('/api/recipes/', {'search': value})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['name'] for recipe in response.data['results']]
+
+    @skipUnless(connection.vendor == 'postgresql', 'нужен PostgreSQL')
+    def test_search_vector(self):
+        self.assertEqual(self.search('борщ'), ['Борщ', 'Рецепт 1'])
+        self.assertEqual(self.search('ингредиент'), ['Рецепт 1', 'Борщ'])
+        self.assertEqual(self.search('уха'), [])
+
+    @skipIf(connection.vendor == 'postgresql', 'индекс не используется')
+    def test_fallback_ranking(self):
+        self.assertEqual(self.search('борщ'), ['Борщ', 'Рецепт 1'])
+        self.assertEqual(self.search('бор'), ['Борщ', 'Рецепт 1'])
+        self.assertEqual(self.search('почти борщ'), ['Рецепт 1'])
+        self.assertEqual(self.search('уха'), [])
+        with mock.patch('recipes.search.SEARCH_FALLBACK_LIMIT', 1):
+            self.assertEqual(self.search('борщ'), ['Борщ'])
+
+    @skipIf(connection.vendor == 'postgresql', 'индекс не используется')
+    def test_fallback_index_follows_changes(self):
+        self.assertEqual(self.search('борщ'), ['Борщ', 'Рецепт 1'])
+        with mock.patch.object(recipe_search_index, 'build') as build:
+            self.check_index_changes()
+        build.assert_not_called()
+
+    def check_index_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe, = self.create_recipes(self.author, 1)
+            recipe.name = 'Зеленый борщ'
+            recipe.save()
+        self.assertEqual(
+            self.search('борщ'), ['Зеленый борщ', 'Борщ', 'Рецепт 1']
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f'/api/recipes/{recipe.pk}/',
+                {
+                    'name': 'Щавелевый суп',
+                    'tags': [self.tags[0].pk],
+                    'ingredients': [
+                        {'id': self.ingredients[0].pk, 'amount': 1}
+                    ],
+                },
+                format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.search('борщ'), ['Борщ', 'Рецепт 1'])
+        self.assertEqual(self.search('щавелевый'), ['Щавелевый суп'])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f'/api/recipes/{self.borsch.pk}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.search('борщ'), ['Рецепт 1'])
+
+
+class ThumbnailTest(ApiTestCase):
+
+    def create_recipe(self, image_name):
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe, = self.create_recipes(self.create_author(0), 1)
+            recipe.image = image_name
+            recipe.save()
+        recipe.refresh_from_db()
+        return recipe
+
+    def test_images_with_same_stem_get_own_thumbnails(self):
+        first = self.create_recipe(create_image('recipes/images/a/dish.png'))
+        second = Recipe.objects.create(
+            author=first.author, name='Другой', text='Описание',
+            cooking_time=10, image=create_image('recipes/images/b/dish.png')
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            second.save()
+        second.refresh_from_db()
+        self.assertNotEqual(first.thumbnail.name, second.thumbnail.name)
+        self.assertTrue(default_storage.exists(first.thumbnail.name))
+        self.assertTrue(default_storage.exists(second.thumbnail.name))
+
+    def test_image_change_replaces_thumbnail(self):
+        recipe = self.create_recipe(create_image('recipes/images/dish.png'))
+        old_name = recipe.thumbnail.name
+        self.assertTrue(default_storage.exists(old_name))
+        recipe.image = create_image('recipes/images/dish.png', 'blue')
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.save()
+        recipe.refresh_from_db()
+        self.assertNotEqual(recipe.thumbnail.name, old_name)
+        self.assertTrue(default_storage.exists(recipe.thumbnail.name))
+        self.assertFalse(default_storage.exists(old_name))
+
+
+class WhatToCookTest(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.author = self.create_author(0)
+        self.client.force_authenticate(self.author)
+        self.first, self.second, self.third = self.ingredients
+        self.both = self.create_recipe('Оба', (self.first, self.second))
+        self.all = self.create_recipe(
+            'Все', (self.first, self.second, self.third)
+        )
+        self.one = self.create_recipe('Один', (self.first,))
+        self.create_recipe('Другой', (self.third,))
+
+    def create_recipe(self, name, ingredients):
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = Recipe.objects.create(
+                author=self.author, name=name, text='Описание',
+                cooking_time=10, image=IMAGE_NAME
+            )
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient, amount=1
+                )
+                for ingredient in ingredients
+            )
+        return recipe
+
+    def what_to_cook(self):
+        response = self.client.get(
+            '/api/recipes/what_to_cook/',
+            {'ingredients': [self.first.pk, self.second.pk]}
+        )
+        self.assertEqual(response.status_code, 200)
+        return [
+            (recipe['name'], round(recipe['coverage'], 2), recipe['missing'])
+            for recipe in response.data['results']
+        ]
+
+    def test_coverage_ordering(self):
+        self.assertEqual(self.what_to_cook(), [
+            ('Один', 1.0, 0), ('Оба', 1.0, 0), ('Все', 0.67, 1)
+        ])
+
+    def test_index_follows_changes(self):
+        self.what_to_cook()
+        with mock.patch.object(recipe_ingredient_index, 'build') as build:
+            self.check_index_changes()
+        build.assert_not_called()
+
+    def check_index_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f'/api/recipes/{self.all.pk}/',
+                {
+                    'tags': [self.tags[0].pk],
+                    'ingredients': [
+                        {'id': self.first.pk, 'amount': 1},
+                        {'id': self.second.pk, 'amount': 1},
+                    ],
+                },
+                format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.what_to_cook(), [
+            ('Один', 1.0, 0), ('Все', 1.0, 0), ('Оба', 1.0, 0)
+        ])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f'/api/recipes/{self.one.pk}/')
+        self.assertEqual(response.status_code, 204)
+        self.create_recipe('Новый', (self.second, self.third))
+        self.assertEqual(self.what_to_cook(), [
+            ('Все', 1.0, 0), ('Оба', 1.0, 0), ('Новый', 0.5, 1)
+        ])
+
+
+class FeedTest(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.author = self.create_author(0)
+        self.other_author = self.create_author(1)
+        self.recipes = self.create_recipes(self.author, 2)
+        self.create_recipes(self.other_author, 1)
+        response = self.client.post(f'/api/users/{self.author.pk}/subscribe/')
+        self.assertEqual(response.status_code, 201)
+
+    def get_feed(self):
+        response = self.client.get('/api/recipes/feed/')
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def test_subscribe_backfills_feed(self):
+        self.assertEqual(
+            self.get_feed(), [recipe.pk for recipe in reversed(self.recipes)]
+        )
+
+    def test_new_recipe_fans_out(self):
+        recipe, = self.create_recipes(self.author, 1)
+        self.create_recipes(self.other_author, 1)
+        self.assertEqual(self.get_feed()[0], recipe.pk)
+        self.assertEqual(len(self.get_feed()), 3)
+
+    def test_unsubscribe_removes_author(self):
+        response = self.client.delete(
+            f'/api/users/{self.author.pk}/subscribe/'
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.get_feed(), [])
+        self.assertFalse(FeedEntry.objects.filter(user=self.user).exists())
+
+    def test_rebuild_feed(self):
+        expected = self.get_feed()
+        FeedEntry.objects.all().delete()
+        self.assertEqual(self.get_feed(), [])
+        output = io.StringIO()
+        call_command('rebuild_feed', stdout=output)
+        self.assertIn('2 записей', output.getvalue())
+        self.assertEqual(self.get_feed(), expected)
+
+
+class CountersTest(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.author = self.create_author(0)
+        self.recipe, = self.create_recipes(self.author, 1)
+
+    def get_counters(self):
+        self.recipe.refresh_from_db()
+        self.author.refresh_from_db()
+        return (
+            self.recipe.favorites_count, self.recipe.shopping_carts_count,
+            self.author.recipes_count, self.author.subscribers_count
+        )
+
+    def test_counters_follow_events(self):
+        self.assertEqual(self.get_counters(), (0, 0, 1, 0))
+        for action in ('favorite', 'shopping_cart'):
+            response = self.client.post(
+                f'/api/recipes/{self.recipe.pk}/{action}/'
+            )
+            self.assertEqual(response.status_code, 201)
+        self.client.post(f'/api/users/{self.author.pk}/subscribe/')
+        self.assertEqual(self.get_counters(), (1, 1, 1, 1))
+        response = self.client.delete(
+            f'/api/recipes/{self.recipe.pk}/favorite/'
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.get_counters(), (0, 1, 1, 1))
+        self.create_recipes(self.author, 2)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, 3)
+
+    def test_recipe_delete_updates_author(self):
+        Favorite.objects.create(user=self.user, recipe=self.recipe)
+        self.client.force_authenticate(self.author)
+        response = self.client.delete(f'/api/recipes/{self.recipe.pk}/')
+        self.assertEqual(response.status_code, 204)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, 0)
+
+    def test_repair_counters(self):
+        Favorite.objects.create(user=self.user, recipe=self.recipe)
+        Subscription.objects.create(user=self.user, author=self.author)
+        Recipe.objects.update(favorites_count=5, shopping_carts_count=2)
+        User.objects.update(recipes_count=7, subscribers_count=0)
+        output = io.StringIO()
+        call_command('repair_counters', stdout=output)
+        self.assertIn('рецептов 1', output.getvalue())
+        self.assertEqual(self.get_counters(), (1, 0, 1, 1))
+        self.user.refresh_from_db()
+        self.assertEqual(
+            (self.user.recipes_count, self.user.subscribers_count), (0, 0)
+        )
+
+
+class ShortLinkTest(ApiTestCase):
+
+    def test_encode_base62(self):
+        self.assertEqual(
+            [encode_base62(number) for number in (0, 9, 10, 61, 62, 3843)],
+            ['0', '9', 'a', 'Z', '10', 'ZZ']
+        )
+
+    def test_slug_and_redirect(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe, = self.create_recipes(self.create_author(0), 1)
+        self.assertEqual(recipe.slug, encode_base62(recipe.pk))
+        response = self.client.get(f'/api/recipes/{recipe.pk}/get-link/')
+        self.assertTrue(response.data['short-link'].endswith(
+            f'/s/{recipe.slug}'
+        ))
+        with self.assertNumQueries(0):
+            response = self.client.get(f'/s/{recipe.slug}')
+        self.assertRedirects(
+            response, f'/recipes/{recipe.pk}', fetch_redirect_response=False
+        )
+
+    def test_cache_miss_fills_cache(self):
+        recipe, = self.create_recipes(self.create_author(0), 1)
+        cache.clear()
+        with self.assertNumQueries(1):
+            self.client.get(f'/s/{recipe.slug}')
+        with self.assertNumQueries(0):
+            response = self.client.get(f'/s/{recipe.slug}')
+        self.assertEqual(response.status_code, 302)
+
+    def test_missing_slug_is_cached(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/s/missing').status_code, 404)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/s/missing').status_code, 404)
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = Recipe.objects.create(
+                author=self.create_author(0), name='Рецепт', text='Описание',
+                cooking_time=10, image=IMAGE_NAME, slug='missing'
+            )
+        response = self.client.get('/s/missing')
+        self.assertRedirects(
+            response, f'/recipes/{recipe.pk}', fetch_redirect_response=False
+        )
+
+
+class LoadIngredientsTest(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def write(self, name, content):
+        path = self.directory / name
+        path.write_text(content, encoding='utf-8')
+        return str(path)
+
+    def load(self, *args):
+        output = io.StringIO()
+        call_command('load_ingredients', *args, stdout=output)
+        return output.getvalue()
+
+    def count_import_queries(self, count):
+        importer = IngredientImporter(batch_size=100)
+        with CaptureQueriesContext(connection) as queries:
+            importer.import_records(
+                {'name': f'Соль {count}-{number}', 'measurement_unit': 'г'}
+                for number in range(count)
+            )
+        self.assertEqual(importer.inserted, count)
+        return len(queries)
+
+    def test_batched_upsert(self):
+        self.assertEqual(
+            self.count_import_queries(3), self.count_import_queries(50)
+        )
+        importer = IngredientImporter(batch_size=2)
+        importer.import_records([
+            {'name': 'Ингредиент 0', 'measurement_unit': 'г'},
+            {'name': ' Перец ', 'measurement_unit': 'г'},
+            {'name': 'Перец', 'measurement_unit': 'г'},
+            {'pk': self.ingredients[1].pk, 'name': 'Ёрш',
+             'measurement_unit': 'шт'},
+            {'name': 'Мука', 'measurement_unit': 'кг'},
+        ])
+        self.assertEqual(
+            (importer.inserted, importer.updated, importer.skipped),
+            (2, 1, 2)
+        )
+        ingredient = Ingredient.objects.get(pk=self.ingredients[1].pk)
+        self.assertEqual(
+            (ingredient.name, ingredient.measurement_unit,
+             ingredient.search_name),
+            ('Ёрш', 'шт', 'ерш')
+        )
+        self.assertTrue(
+            Ingredient.objects.filter(name='Перец', search_name='перец')
+            .exists()
+        )
+
+    def test_rerun_is_idempotent(self):
+        csv_path = self.write('ingredients.csv', 'Мука,г\nСахар,г\n')
+        json_path = self.write('dump.json', json.dumps([
+            {'model': 'recipes.ingredient', 'pk': 1000,
+             'fields': {'name': 'Молоко', 'measurement_unit': 'мл'}},
+            {'model': 'recipes.tag', 'pk': 1, 'fields': {}},
+        ]))
+        self.assertIn(
+            'добавлено 3, обновлено 0, пропущено 0',
+            self.load(csv_path, json_path, '--batch-size', '1')
+        )
+        self.assertIn(
+            'добавлено 0, обновлено 0, пропущено 3',
+            self.load(csv_path, json_path)
+        )
+        self.assertEqual(Ingredient.objects.count(), 6)
+        self.assertEqual(Ingredient.objects.get(pk=1000).name, 'Молоко')
+
+    def test_errors(self):
+        bad_path = self.write('bad.csv', 'Мука,г\nСахар,г,лишнее\n')
+        for args, message in (
+            ((bad_path,), 'Строка 2: ожидалось 2 столбца'),
+            ((str(self.directory / 'missing.csv'),), 'Файл не найден'),
+            ((self.write('data.txt', ''),), 'Неподдерживаемый формат'),
+            ((bad_path, '--batch-size', '0'), 'должен быть больше 0'),
+            ((self.write('bad.json', '{}'),), 'Ожидался JSON-массив'),
+        ):
+            with self.subTest(message=message):
+                with self.assertRaisesMessage(CommandError, message):
+                    self.load(*args)
+
+    @skipIf(connection.vendor == 'postgresql', 'COPY доступен')
+    def test_copy_requires_postgresql(self):
+        with self.assertRaisesMessage(CommandError, 'только для PostgreSQL'):
+            self.load(self.write('ingredients.csv', 'Мука,г\n'), '--copy')
+
+
+class BulkPrimaryKeyRelatedFieldTest(ApiTestCase):
+
+    def get_errors(self, field, data):
+        with self.assertRaises(serializers.ValidationError) as context:
+            field.run_validation(data)
+        return context.exception.detail
+
+    def test_valid_ids(self):
+        field = BulkPrimaryKeyRelatedField(
+            queryset=Tag.objects.all(), many=True
+        )
+        tags = [self.tags[1].pk, self.tags[0].pk]
+        with self.assertNumQueries(1):
+            self.assertEqual(field.run_validation(tags), self.tags[::-1])
+
+    def test_one_error_per_missing_id(self):
+        last_pk = max(tag.pk for tag in self.tags)
+        missing = [last_pk + 2, last_pk + 1]
+        data = [self.tags[0].pk, missing[0], self.tags[1].pk, missing[1],
+                missing[0]]
+        field = BulkPrimaryKeyRelatedField(
+            queryset=Tag.objects.all(), many=True
+        )
+        stock_field = serializers.PrimaryKeyRelatedField(
+            queryset=Tag.objects.all()
+        )
+        expected = [self.get_errors(stock_field, pk)[0] for pk in missing]
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get_errors(field, data), expected)
+        self.assertEqual(
+            self.get_errors(field, [self.tags[0].pk, 'тег']),
+            self.get_errors(
+                serializers.PrimaryKeyRelatedField(
+                    queryset=Tag.objects.all(), many=True
+                ),
+                [self.tags[0].pk, 'тег']
+            )
+        )
+
+    def test_recipe_tags_errors(self):
+        missing = max(tag.pk for tag in self.tags) + 1
+        response = self.client.post('/api/recipes/', {
+            'tags': [self.tags[0].pk, missing, missing + 1],
+            'ingredients': [{'id': self.ingredients[0].pk, 'amount': 1}],
+            'name': 'Рецепт', 'text': 'Описание', 'cooking_time': 10,
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.data['tags']), 2)
+        self.assertIn(str(missing + 1), response.data['tags'][1])
@@ -1,17 +1,33 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import (IngredientViewSet, RecipeViewSet, TagViewSet,
-                    FoodgramUserViewSet)
+from .catalogue import ingredient_catalogue, tag_catalogue
+from .views import (IngredientViewSet, RecipeViewSet, FoodgramUserViewSet,
+                    catalogue_detail, catalogue_list)
 
 
 router = DefaultRouter()
 router.register(r'users', FoodgramUserViewSet, basename="me")
-router.register(r'tags', TagViewSet, basename='tags')
 router.register(r'ingredients', IngredientViewSet, basename='ingredients')
 router.register(r'recipes', RecipeViewSet, basename='recipes')
 
 urlpatterns = [
     path('auth/', include('djoser.urls.authtoken')),
+    path(
+        'tags/', catalogue_list, {'catalogue': tag_catalogue},
+        name='tags-list'
+    ),
+    path(
+        'tags/<int:pk>/', catalogue_detail, {'catalogue': tag_catalogue},
+        name='tags-detail'
+    ),
+    path(
+        'ingredients/', catalogue_list, {'catalogue': ingredient_catalogue},
+        name='ingredients-list'
+    ),
+    path(
+        'ingredients/<int:pk>/', catalogue_detail,
+        {'catalogue': ingredient_catalogue}, name='ingredients-detail'
+    ),
     path('', include(router.urls)),
 ]
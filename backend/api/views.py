@@ -1,25 +1,47 @@
-from django.db.models import Sum, Count
+from asgiref.sync import sync_to_async
+from django.db.models import Prefetch
 from django_filters.rest_framework import DjangoFilterBackend
-from django.http import FileResponse
+from django.http import (
+    HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+)
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 from djoser.views import UserViewSet
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
-from .paginations import FoodgramPagination
+from .catalogue import (
+    ingredient_catalogue, recipe_ingredient_index, recommendation_model
+)
+from .constants import (
+    AUTOCOMPLETE_LIMIT, MAX_AUTOCOMPLETE_LIMIT, MAX_BATCH_SIZE
+)
+from .paginations import (
+    FeedPagination, FoodgramPagination, RecipePagination,
+    SubscriptionPagination
+)
 from .serializers import (AvatarSerializer, FavoriteSerializer,
-                          RecipeCreateSerializer, RecipeGetSerializer,
+                          RecipeBatchSerializer, RecipeCreateSerializer,
+                          RecipeGetSerializer, RecipeMatchSerializer,
+                          RecipeRecommendationSerializer,
                           ShoppingCartSerializer, IngredientSerializer,
-                          TagSerialiser, UserSubscribeRepresentSerializer,
-                          UserSubscribeSerializer, RecipeIngredient)
+                          UserSubscribeRepresentSerializer,
+                          UserSubscribeSerializer)
 from .services import (
-    create_model_recipe, delete_model_recipe, generate_shopping_list
+    SHOPPING_LIST_FORMATS, create_model_recipe, create_model_recipes,
+    delete_model_recipe, delete_model_recipes,
+    get_catalogue_json_response, get_catalogue_response,
+    get_positive_int_list_param, get_positive_int_param, get_recipes_limit,
+    get_recommendation_seeds,
+    get_shopping_list, get_shopping_list_version
 )
-from .filters import IngredientFilter, RecipeFilter
-from recipes.models import (Favorite, Ingredient, Recipe,
-                            ShoppingCart, Tag)
+from .filters import RecipeFilter
+from .permissions import IsAdminAuthorOrReadOnly
+from recipes.feed import get_feed
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart
 from users.models import Subscription, User
 
 
@@ -65,7 +87,10 @@ class FoodgramUserViewSet(UserViewSet):
         author = get_object_or_404(User, id=id)
         serializer = UserSubscribeSerializer(
             data={'user': request.user.id, 'author': author.id},
-            context={'request': request}
+            context={
+                'request': request,
+                'recipes_limit': get_recipes_limit(request),
+            }
         )
         serializer.is_valid(raise_exception=True)
         serializer.save()
@@ -90,49 +115,100 @@ class FoodgramUserViewSet(UserViewSet):
         methods=('get',),
         detail=False,
         permission_classes=(IsAuthenticated,),
+        pagination_class=SubscriptionPagination,
         url_path='subscriptions',
         url_name='subscriptions',
     )
     def subscriptions(self, request):
+        recipes_limit = get_recipes_limit(request)
         queryset = User.objects.filter(
             subscriptions_on_author__user=request.user
-        ).annotate(recipes_count=Count('recipes'))
+        ).order_by('username').prefetch_related(
+            Prefetch(
+                'recipes',
+                queryset=Recipe.objects.first_per_author(recipes_limit),
+                to_attr='recipes_preview'
+            )
+        )
+        context = {'request': request, 'recipes_limit': recipes_limit}
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = UserSubscribeRepresentSerializer(
-                page, many=True, context={'request': request}
+                page, many=True, context=context
             )
             return self.get_paginated_response(serializer.data)
         serializer = UserSubscribeRepresentSerializer(
-            queryset, many=True, context={'request': request}
+            queryset, many=True, context=context
         )
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Tag.objects.all()
-    serializer_class = TagSerialiser
-    permission_classes = (AllowAny, )
-    pagination_class = None
+SAFE_METHODS = ('GET', 'HEAD')
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+async def catalogue_list(request, catalogue):
+    if request.method not in SAFE_METHODS:
+        return HttpResponseNotAllowed(SAFE_METHODS)
+    catalogue = await sync_to_async(catalogue.refresh)()
+    items = catalogue.filter(request.GET)
+    return get_catalogue_json_response(
+        request, items,
+        catalogue.etag if items is catalogue.items
+        else catalogue.get_etag(items)
+    )
+
+
+async def catalogue_detail(request, catalogue, pk):
+    if request.method not in SAFE_METHODS:
+        return HttpResponseNotAllowed(SAFE_METHODS)
+    catalogue = await sync_to_async(catalogue.refresh)()
+    item = catalogue.by_id.get(pk)
+    if item is None:
+        return JsonResponse(
+            {'detail': 'Страница не найдена.'},
+            status=status.HTTP_404_NOT_FOUND,
+            json_dumps_params={'ensure_ascii': False}
+        )
+    return get_catalogue_json_response(
+        request, item, catalogue.get_etag(item)
+    )
+
+
+class IngredientViewSet(viewsets.GenericViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (AllowAny, )
-    filter_backends = (DjangoFilterBackend, )
-    filterset_class = IngredientFilter
     pagination_class = None
+    catalogue = ingredient_catalogue
+
+    @action(
+        detail=False,
+        methods=('get',),
+        url_path='autocomplete',
+    )
+    def autocomplete(self, request):
+        limit = get_positive_int_param(
+            request, 'limit', AUTOCOMPLETE_LIMIT, MAX_AUTOCOMPLETE_LIMIT
+        )
+        catalogue = self.catalogue.refresh()
+        ingredients = catalogue.autocomplete(
+            request.query_params.get('name', ''), limit
+        )
+        return get_catalogue_response(
+            request, ingredients, catalogue.get_etag(ingredients)
+        )
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
-    queryset = Recipe.objects.select_related(
-        'author'
-    ).prefetch_related('tags', 'ingredients')
-    pagination_class = FoodgramPagination
+    queryset = Recipe.objects.with_related()
+    permission_classes = (IsAdminAuthorOrReadOnly,)
+    pagination_class = RecipePagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
+    def get_queryset(self):
+        return super().get_queryset().with_user_flags(self.request.user)
+
     def get_serializer_class(self):
         if self.action in ('list', 'retrieve'):
             return RecipeGetSerializer
@@ -168,6 +244,108 @@ class RecipeViewSet(viewsets.ModelViewSet):
         error_msg = 'Нет этого рецепта в списке покупок'
         return delete_model_recipe(request, ShoppingCart, recipe, error_msg)
 
+    def get_batch_recipe_ids(self):
+        serializer = RecipeBatchSerializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data['recipes']
+
+    @action(
+        detail=False,
+        methods=('post',),
+        url_path='favorite/batch',
+        url_name='favorite-batch',
+        permission_classes=(IsAuthenticated,)
+    )
+    def favorite_batch(self, request):
+        return create_model_recipes(
+            request, Favorite, self.get_batch_recipe_ids()
+        )
+
+    @favorite_batch.mapping.delete
+    def delete_favorite_batch(self, request):
+        return delete_model_recipes(
+            request, Favorite, self.get_batch_recipe_ids()
+        )
+
+    @action(
+        detail=False,
+        methods=('post',),
+        url_path='shopping_cart/batch',
+        url_name='shopping-cart-batch',
+        permission_classes=(IsAuthenticated,)
+    )
+    def shopping_cart_batch(self, request):
+        return create_model_recipes(
+            request, ShoppingCart, self.get_batch_recipe_ids()
+        )
+
+    @shopping_cart_batch.mapping.delete
+    def delete_shopping_cart_batch(self, request):
+        return delete_model_recipes(
+            request, ShoppingCart, self.get_batch_recipe_ids()
+        )
+
+    @action(
+        detail=False,
+        methods=('get',),
+        url_path='what_to_cook',
+        url_name='what-to-cook',
+        pagination_class=FoodgramPagination
+    )
+    def what_to_cook(self, request):
+        matches = recipe_ingredient_index.refresh().match(
+            get_positive_int_list_param(
+                request, 'ingredients', MAX_BATCH_SIZE
+            )
+        )
+        return self.get_paginated_recipes(matches, RecipeMatchSerializer)
+
+    @action(
+        detail=False,
+        methods=('get',),
+        url_path='recommended',
+        url_name='recommended',
+        permission_classes=(IsAuthenticated,),
+        pagination_class=FoodgramPagination
+    )
+    def recommended(self, request):
+        return self.get_paginated_recipes(
+            recommendation_model.refresh().recommend(
+                *get_recommendation_seeds(request.user)
+            ),
+            RecipeRecommendationSerializer
+        )
+
+    @action(
+        detail=False,
+        methods=('get',),
+        url_path='feed',
+        url_name='feed',
+        permission_classes=(IsAuthenticated,),
+        pagination_class=FeedPagination
+    )
+    def feed(self, request):
+        return self.get_paginated_recipes(
+            get_feed(request.user), RecipeGetSerializer
+        )
+
+    def get_paginated_recipes(self, items, serializer_class):
+        page = self.paginate_queryset(items)
+        recipes = self.get_queryset().in_bulk(
+            [item.recipe_id for item in page]
+        )
+        found = []
+        for item in page:
+            recipe = recipes.get(item.recipe_id)
+            if recipe is not None:
+                for name, value in item._asdict().items():
+                    setattr(recipe, name, value)
+                found.append(recipe)
+        serializer = serializer_class(
+            found, many=True, context=self.get_serializer_context()
+        )
+        return self.get_paginated_response(serializer.data)
+
     @action(
         detail=False,
         methods=('get',),
@@ -175,25 +353,34 @@ class RecipeViewSet(viewsets.ModelViewSet):
         permission_classes=(IsAuthenticated,)
     )
     def download_shopping_cart(self, request):
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__shoppingcarts__user=request.user
-        ).values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(
-            ingredient_amount=Sum('amount')
-        ).order_by('ingredient__name')
-
-        cart_recipes = Recipe.objects.filter(
-            shoppingcarts__user=request.user
-        )
-        shopping_list_text = generate_shopping_list(ingredients, cart_recipes)
-        response = FileResponse(
-            shopping_list_text,
-            content_type='text/plain; charset=utf-8'
-        )
-        response[
-            'Content-Disposition'
-        ] = 'attachment; filename="shopping_list.txt"'
+        file_format = request.query_params.get('file_format', 'txt')
+        if file_format not in SHOPPING_LIST_FORMATS:
+            return Response(
+                {'file_format': 'Доступные форматы: '
+                 f'{", ".join(SHOPPING_LIST_FORMATS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        generate_file, content_type = SHOPPING_LIST_FORMATS[file_format]
+
+        version = get_shopping_list_version(request.user)
+        etag = quote_etag(f'{version["etag"]}-{file_format}')
+        last_modified = int(version['last_modified'].timestamp())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            cart_recipes, ingredients = get_shopping_list(
+                request.user, version
+            )
+            response = StreamingHttpResponse(
+                generate_file(ingredients, cart_recipes),
+                content_type=content_type
+            )
+            response['Content-Disposition'] = (
+                f'attachment; filename="shopping_list.{file_format}"'
+            )
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
         return response
 
     @action(
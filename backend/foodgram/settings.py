@@ -32,6 +32,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -81,6 +82,33 @@ else:
         }
     }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'api.metrics': {
+            'handlers': ['console'],
+            'level': os.getenv('REQUEST_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -115,12 +143,24 @@ FILE_PATH_INGREDIENTS = BASE_DIR / 'data'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+
+RECOMMENDATIONS_PATH = os.getenv(
+    'RECOMMENDATIONS_PATH', BASE_DIR / 'recommendations.bin'
+)
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'users.User'
 
 PAGE_SIZE = 6
 
+PAGINATION_COUNT_STRATEGY = os.getenv('PAGINATION_COUNT_STRATEGY', 'exact')
+PAGINATION_COUNT_TIMEOUT = int(os.getenv('PAGINATION_COUNT_TIMEOUT', 60))
+PAGINATION_COUNT_ESTIMATE_THRESHOLD = int(
+    os.getenv('PAGINATION_COUNT_ESTIMATE_THRESHOLD', 100000)
+)
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
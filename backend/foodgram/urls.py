@@ -3,13 +3,15 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from api.metrics import metrics_view
 from recipes.views import redirect_to_recipe
 
 
 urlpatterns = [
     path('api/', include('api.urls')),
     path('admin/', admin.site.urls),
-    path('s/<slug:slug>', redirect_to_recipe, name='redirect_full_url')
+    path('s/<slug:slug>', redirect_to_recipe, name='redirect_full_url'),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 if settings.DEBUG:
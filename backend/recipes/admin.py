@@ -37,8 +37,9 @@ class RecipeAdmin(admin.ModelAdmin):
     ]
 
     def favorites_amount(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
     favorites_amount.short_description = 'Кол-во в избранном'
+    favorites_amount.admin_order_field = 'favorites_count'
 
     def display_tags(self, obj):
         return ', '.join([tag.name for tag in obj.tags.all()])
@@ -0,0 +1,62 @@
+from contextlib import contextmanager
+from threading import local
+
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Favorite, Recipe, ShoppingCart
+from users.models import Subscription
+
+RECIPE_COUNTERS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'shopping_carts_count',
+}
+USER_COUNTERS = {
+    'recipes_count': (Recipe, 'author'),
+    'subscribers_count': (Subscription, 'author'),
+}
+
+
+def change_counter(queryset, field, delta):
+    return queryset.update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def get_count(model, lookup):
+    return Coalesce(Subquery(
+        model.objects.filter(**{lookup: OuterRef('pk')}).order_by().values(
+            lookup
+        ).annotate(count=Count('pk')).values('count')
+    ), 0)
+
+
+def recount_recipe_counters(queryset, models=tuple(RECIPE_COUNTERS)):
+    return queryset.update(**{
+        RECIPE_COUNTERS[model]: get_count(model, 'recipe') for model in models
+    })
+
+
+def recount_user_counters(queryset):
+    return queryset.update(**{
+        field: get_count(model, lookup)
+        for field, (model, lookup) in USER_COUNTERS.items()
+    })
+
+
+class SuspendedCounters(local):
+
+    def __init__(self):
+        self.recipe_ids = set()
+
+
+suspended_counters = SuspendedCounters()
+
+
+@contextmanager
+def batch_recipe_counters(recipe_ids, models=tuple(RECIPE_COUNTERS)):
+    recipe_ids = set(recipe_ids) - suspended_counters.recipe_ids
+    suspended_counters.recipe_ids |= recipe_ids
+    try:
+        yield
+    finally:
+        suspended_counters.recipe_ids -= recipe_ids
+    recount_recipe_counters(Recipe.objects.filter(pk__in=recipe_ids), models)
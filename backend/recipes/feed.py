@@ -0,0 +1,66 @@
+from itertools import islice
+
+from django.db import transaction
+
+from .models import FeedEntry, Recipe
+from api.constants import FEED_BATCH_SIZE
+from users.models import Subscription
+
+
+def create_feed_entries(rows):
+    rows = iter(rows)
+    created = 0
+    while True:
+        batch = [
+            FeedEntry(
+                user_id=user_id, recipe_id=recipe_id, author_id=author_id,
+                pub_date=pub_date
+            )
+            for user_id, recipe_id, author_id, pub_date
+            in islice(rows, FEED_BATCH_SIZE)
+        ]
+        if not batch:
+            return created
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+        created += len(batch)
+
+
+def fan_out_recipe(recipe):
+    return create_feed_entries(
+        (user_id, recipe.pk, recipe.author_id, recipe.pub_date)
+        for user_id in Subscription.objects.filter(
+            author_id=recipe.author_id
+        ).values_list('user_id', flat=True).iterator()
+    )
+
+
+def add_author_to_feed(user_id, author_id):
+    return create_feed_entries(
+        (user_id, recipe_id, author_id, pub_date)
+        for recipe_id, pub_date in Recipe.objects.filter(
+            author_id=author_id
+        ).order_by().values_list('pk', 'pub_date').iterator()
+    )
+
+
+def remove_author_from_feed(user_id, author_id):
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild_feed():
+    with transaction.atomic():
+        FeedEntry.objects.all().delete()
+        return create_feed_entries(
+            Recipe.objects.filter(
+                author__subscriptions_on_author__isnull=False
+            ).order_by().values_list(
+                'author__subscriptions_on_author__user_id', 'pk',
+                'author_id', 'pub_date'
+            ).iterator()
+        )
+
+
+def get_feed(user):
+    return FeedEntry.objects.filter(user=user).values_list(
+        'recipe_id', 'pub_date', named=True
+    )
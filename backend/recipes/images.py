@@ -0,0 +1,74 @@
+import hashlib
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection
+from PIL import Image, ImageOps, features
+
+from api.constants import THUMBNAIL_QUALITY, THUMBNAIL_SIZE
+
+THUMBNAIL_DIR = 'media/recipes/thumbnails/'
+THUMBNAIL_FORMAT = 'WEBP' if features.check('webp') else 'JPEG'
+
+logger = logging.getLogger(__name__)
+
+
+def get_thumbnail_name(pk, image_name):
+    digest = hashlib.md5(image_name.encode()).hexdigest()[:12]
+    return f'{THUMBNAIL_DIR}{pk}_{digest}.{THUMBNAIL_FORMAT.lower()}'
+
+
+def render_thumbnail(file):
+    with Image.open(file) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(THUMBNAIL_SIZE)
+        image = image.convert('RGBA' if THUMBNAIL_FORMAT == 'WEBP' else 'RGB')
+        buffer = io.BytesIO()
+        image.save(buffer, THUMBNAIL_FORMAT, quality=THUMBNAIL_QUALITY)
+    return ContentFile(buffer.getvalue())
+
+
+def create_thumbnail(model, pk, image_name, old_name=None):
+    storage = model._meta.get_field('thumbnail').storage
+    name = get_thumbnail_name(pk, image_name)
+    try:
+        with storage.open(image_name) as file:
+            content = render_thumbnail(file)
+        storage.delete(name)
+        name = storage.save(name, content)
+    except Exception:
+        logger.exception('Не удалось создать миниатюру для %s', image_name)
+        return False
+    if not model.objects.filter(pk=pk, image=image_name).update(
+        thumbnail=name
+    ):
+        storage.delete(name)
+        return False
+    if old_name and old_name != name:
+        storage.delete(old_name)
+    return True
+
+
+def create_thumbnail_in_worker(model, pk, image_name, old_name):
+    try:
+        create_thumbnail(model, pk, image_name, old_name)
+    finally:
+        connection.close()
+
+
+@lru_cache(maxsize=None)
+def get_executor(workers):
+    return ThreadPoolExecutor(workers, thread_name_prefix='thumbnails')
+
+
+def schedule_thumbnail(model, pk, image_name, old_name=None):
+    if not settings.IMAGE_WORKERS:
+        create_thumbnail(model, pk, image_name, old_name)
+        return
+    get_executor(settings.IMAGE_WORKERS).submit(
+        create_thumbnail_in_worker, model, pk, image_name, old_name
+    )
@@ -0,0 +1,226 @@
+import csv
+import io
+import json
+from itertools import islice
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Q
+
+from api.constants import MAX_LENGTH_INGREDIENT, MAX_LENGTH_UNIT
+from .models import Ingredient
+from .services import normalize_ingredient_name
+
+INGREDIENT_FIXTURE_MODEL = 'recipes.ingredient'
+JSON_CHUNK_SIZE = 64 * 1024
+
+
+class ImportRecordError(ValueError):
+    pass
+
+
+def iter_json_array(file):
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    eof = False
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if not started and position < len(buffer):
+            if buffer[position] != '[':
+                raise ImportRecordError('Ожидался JSON-массив')
+            started = True
+            position += 1
+            continue
+        if started and position < len(buffer) and buffer[position] == ']':
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise ImportRecordError('Некорректный JSON')
+            chunk = file.read(JSON_CHUNK_SIZE)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield item
+        position = end
+
+
+def read_csv(file):
+    for line, row in enumerate(csv.reader(file), start=1):
+        if not row:
+            continue
+        if len(row) != 2:
+            raise ImportRecordError(f'Строка {line}: ожидалось 2 столбца')
+        yield {'name': row[0], 'measurement_unit': row[1]}
+
+
+def read_json(file):
+    for item in iter_json_array(file):
+        if not isinstance(item, dict):
+            raise ImportRecordError(f'Некорректная запись: {item!r}')
+        if 'model' not in item:
+            yield item
+        elif item['model'] == INGREDIENT_FIXTURE_MODEL:
+            yield {'pk': item.get('pk'), **item.get('fields', {})}
+
+
+READERS = {
+    '.csv': read_csv,
+    '.json': read_json,
+}
+
+
+def clean_record(record):
+    try:
+        name = record['name'].strip()
+        measurement_unit = record['measurement_unit'].strip()
+    except (KeyError, AttributeError):
+        raise ImportRecordError(f'Некорректная запись: {record!r}')
+    if not name or not measurement_unit:
+        raise ImportRecordError(f'Пустое поле в записи: {record!r}')
+    if (len(name) > MAX_LENGTH_INGREDIENT
+            or len(measurement_unit) > MAX_LENGTH_UNIT):
+        raise ImportRecordError(f'Слишком длинное значение: {record!r}')
+    return {
+        'pk': record.get('pk'),
+        'name': name,
+        'measurement_unit': measurement_unit,
+        'search_name': normalize_ingredient_name(name),
+    }
+
+
+class IngredientImporter:
+
+    def __init__(self, batch_size, use_copy=False):
+        self.batch_size = batch_size
+        self.use_copy = use_copy
+        self.inserted = 0
+        self.updated = 0
+        self.skipped = 0
+        self.reset_sequence = False
+
+    @property
+    def processed(self):
+        return self.inserted + self.updated + self.skipped
+
+    def import_records(self, records):
+        records = iter(records)
+        while True:
+            batch = [
+                clean_record(record)
+                for record in islice(records, self.batch_size)
+            ]
+            if not batch:
+                break
+            batch = self.deduplicate(batch)
+            if self.use_copy and all(
+                record['pk'] is None for record in batch
+            ):
+                self.copy_batch(batch)
+            else:
+                self.import_batch(batch)
+        if self.reset_sequence:
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(
+                    no_style(), (Ingredient,)
+                ):
+                    cursor.execute(sql)
+            self.reset_sequence = False
+
+    def deduplicate(self, batch):
+        unique = {}
+        for record in batch:
+            key = (record['name'], record['measurement_unit'])
+            if key in unique:
+                self.skipped += 1
+            else:
+                unique[key] = record
+        return list(unique.values())
+
+    def import_batch(self, batch):
+        pks = {record['pk'] for record in batch if record['pk'] is not None}
+        existing = Ingredient.objects.filter(
+            Q(name__in={record['name'] for record in batch}) | Q(pk__in=pks)
+        )
+        by_pk = {ingredient.pk: ingredient for ingredient in existing}
+        by_key = {
+            (ingredient.name, ingredient.measurement_unit): ingredient
+            for ingredient in by_pk.values()
+        }
+        to_create = []
+        to_update = []
+        for record in batch:
+            owner = by_key.get((record['name'], record['measurement_unit']))
+            ingredient = by_pk.get(record['pk']) or owner
+            if owner is not None and owner is not ingredient:
+                self.skipped += 1
+            elif ingredient is None:
+                to_create.append(Ingredient(
+                    pk=record['pk'],
+                    name=record['name'],
+                    measurement_unit=record['measurement_unit'],
+                    search_name=record['search_name'],
+                ))
+                self.reset_sequence |= record['pk'] is not None
+            elif (
+                ingredient.name,
+                ingredient.measurement_unit,
+                ingredient.search_name
+            ) != (
+                record['name'],
+                record['measurement_unit'],
+                record['search_name']
+            ):
+                ingredient.name = record['name']
+                ingredient.measurement_unit = record['measurement_unit']
+                ingredient.search_name = record['search_name']
+                to_update.append(ingredient)
+            else:
+                self.skipped += 1
+        with transaction.atomic():
+            Ingredient.objects.bulk_update(
+                to_update, ('name', 'measurement_unit', 'search_name')
+            )
+            Ingredient.objects.bulk_create(to_create)
+        self.inserted += len(to_create)
+        self.updated += len(to_update)
+
+    def copy_batch(self, batch):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for record in batch:
+            writer.writerow((
+                record['name'],
+                record['measurement_unit'],
+                record['search_name'],
+            ))
+        buffer.seek(0)
+        table = connection.ops.quote_name(Ingredient._meta.db_table)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMP TABLE ingredient_import '
+                '(name text, measurement_unit text, search_name text) '
+                'ON COMMIT DROP'
+            )
+            cursor.copy_expert(
+                'COPY ingredient_import FROM STDIN WITH (FORMAT csv)', buffer
+            )
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit, search_name) '
+                'SELECT name, measurement_unit, search_name '
+                'FROM ingredient_import '
+                'ON CONFLICT (name, measurement_unit) DO UPDATE '
+                'SET search_name = EXCLUDED.search_name '
+                f'WHERE {table}.search_name '
+                'IS DISTINCT FROM EXCLUDED.search_name '
+                'RETURNING xmax = 0'
+            )
+            results = [inserted for inserted, in cursor.fetchall()]
+        self.inserted += sum(results)
+        self.updated += len(results) - sum(results)
+        self.skipped += len(batch) - len(results)
@@ -0,0 +1,56 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipes.models import Favorite, Recipe, RecipeIngredient, ShoppingCart
+from recipes.recommendations import TAG_WEIGHT, build_model, write_model
+
+
+class Command(BaseCommand):
+    help = (
+        'Строит модель похожих рецептов по избранному, спискам покупок, '
+        'тегам и ингредиентам для эндпоинта рекомендаций.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', default=settings.RECOMMENDATIONS_PATH,
+            help='Файл модели',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        features = [
+            (recipe_id, ('tag', tag_id), TAG_WEIGHT)
+            for recipe_id, tag_id in Recipe.tags.through.objects.values_list(
+                'recipe_id', 'tag_id'
+            ).iterator()
+        ]
+        features += [
+            (recipe_id, ('ingredient', ingredient_id), 1.0)
+            for recipe_id, ingredient_id in (
+                RecipeIngredient.objects.values_list(
+                    'recipe_id', 'ingredient_id'
+                ).iterator()
+            )
+        ]
+        model = build_model(
+            Recipe.objects.values_list('pk', flat=True).iterator(),
+            {
+                kind: list(interaction_model.objects.values_list(
+                    'user_id', 'recipe_id'
+                ))
+                for kind, interaction_model in (
+                    ('favorite', Favorite), ('cart', ShoppingCart)
+                )
+            },
+            features
+        )
+        write_model(options['output'], *model)
+        recipe_ids, _, neighbours, _, _ = model
+        self.stdout.write(self.style.SUCCESS(
+            f'Модель рекомендаций записана в {options["output"]}: '
+            f'рецептов {len(recipe_ids)}, связей {len(neighbours)} '
+            f'за {time.monotonic() - started:.2f} с.'
+        ))
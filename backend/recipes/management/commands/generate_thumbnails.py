@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import create_thumbnail, get_thumbnail_name
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Создает миниатюры для рецептов, у которых их еще нет.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересоздать миниатюры для всех рецептов',
+        )
+
+    def handle(self, *args, **options):
+        created = failed = 0
+        recipes = Recipe.objects.exclude(image='').values_list(
+            'pk', 'image', 'thumbnail'
+        )
+        for pk, image_name, thumbnail_name in recipes.iterator():
+            if (
+                not options['force']
+                and thumbnail_name == get_thumbnail_name(pk, image_name)
+            ):
+                continue
+            if create_thumbnail(Recipe, pk, image_name, thumbnail_name):
+                created += 1
+            else:
+                failed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Миниатюры созданы: {created}, с ошибками: {failed}.'
+        ))
@@ -1,41 +1,67 @@
-import csv
+import time
 from pathlib import Path
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, connection
 
+from recipes.importers import READERS, ImportRecordError, IngredientImporter
 from recipes.models import Ingredient
+from recipes.services import bump_catalogue_version
+
+DEFAULT_BATCH_SIZE = 500
 
 
 class Command(BaseCommand):
+    help = (
+        'Загружает ингредиенты из CSV, JSON или фикстуры dump.json, '
+        'обновляя уже существующие записи.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'files', nargs='*', type=Path,
+            default=[settings.FILE_PATH_INGREDIENTS / 'ingredients.csv'],
+            help='Файлы для загрузки (.csv или .json)',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Количество записей в одной пачке',
+        )
+        parser.add_argument(
+            '--copy', action='store_true',
+            help='Загружать через COPY (только PostgreSQL)',
+        )
 
-    def handle(self, *args, **kwargs):
-        csv_file = Path(settings.FILE_PATH_INGREDIENTS / 'ingredients.csv')
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше 0')
+        if options['copy'] and connection.vendor != 'postgresql':
+            raise CommandError('--copy доступен только для PostgreSQL')
+        for path in options['files']:
+            if path.suffix not in READERS:
+                raise CommandError(f'Неподдерживаемый формат файла: {path}')
 
+        importer = IngredientImporter(
+            options['batch_size'], use_copy=options['copy']
+        )
+        started = time.monotonic()
         try:
-            with open(csv_file, 'r', encoding='utf-8') as file:
-                reader = csv.reader(file)
-                ingredients = [
-                    Ingredient(
-                        name=name.strip(),
-                        measurement_unit=measurement_unit.strip()
-                    )
-                    for name, measurement_unit in reader
-                ]
-                Ingredient.objects.bulk_create(
-                    ingredients, ignore_conflicts=True
-                )
-
-                self.stdout.write(self.style.SUCCESS(
-                    'Ингредиенты успешно загружены.'
-                ))
-
-        except FileNotFoundError:
-            self.stdout.write(self.style.ERROR(
-                f'Файл не найден: '
-                f'{settings.FILE_PATH_INGREDIENTS}/ingredients.csv'
-            ))
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(
-                f'Ошибка при открытии файла: {str(e)}'
-            ))
+            for path in options['files']:
+                with open(path, encoding='utf-8', newline='') as file:
+                    importer.import_records(READERS[path.suffix](file))
+        except FileNotFoundError as error:
+            raise CommandError(f'Файл не найден: {error.filename}')
+        except (ImportRecordError, IntegrityError) as error:
+            raise CommandError(f'Ошибка загрузки {path}: {error}')
+        finally:
+            bump_catalogue_version(Ingredient)
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Ингредиенты загружены: добавлено {importer.inserted}, '
+            f'обновлено {importer.updated}, '
+            f'пропущено {importer.skipped} '
+            f'за {elapsed:.2f} с '
+            f'({importer.processed / max(elapsed, 1e-6):.0f} записей/с).'
+        ))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from recipes.feed import rebuild_feed
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает ленты подписок пользователей.'
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS(
+            f'Лента подписок пересобрана: {rebuild_feed()} записей.'
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from recipes.counters import recount_recipe_counters, recount_user_counters
+from recipes.models import Recipe
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики рецептов и пользователей.'
+
+    def handle(self, *args, **options):
+        recipes = recount_recipe_counters(Recipe.objects.all())
+        users = recount_user_counters(User.objects.all())
+        self.stdout.write(self.style.SUCCESS(
+            f'Счетчики пересчитаны: рецептов {recipes}, '
+            f'пользователей {users}.'
+        ))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+from recipes.search import update_search_vectors
+from recipes.services import bump_catalogue_version
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает поисковые векторы рецептов и сбрасывает индексы '
+        'рецептов в памяти процессов.'
+    )
+
+    def handle(self, *args, **options):
+        update_search_vectors(Recipe.objects.all())
+        bump_catalogue_version(Recipe)
+        self.stdout.write(self.style.SUCCESS(
+            f'Поисковые векторы обновлены: {Recipe.objects.count()}.'
+        ))
@@ -0,0 +1,175 @@
+from collections import defaultdict, namedtuple
+
+from .services import RecipeIndex, synchronized
+
+RecipeMatch = namedtuple('RecipeMatch', ('recipe_id', 'coverage', 'missing'))
+
+
+def to_bitmap(positions, size):
+    bitmap = bytearray((size + 7) // 8)
+    for position in positions:
+        bitmap[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(bitmap, 'little')
+
+
+def count_bits(bitmap):
+    return bin(bitmap).count('1')
+
+
+def iter_bits_reversed(bitmap):
+    while bitmap:
+        position = bitmap.bit_length() - 1
+        yield position
+        bitmap ^= 1 << position
+
+
+class RecipeMatches:
+
+    def __init__(self, recipe_ids, buckets):
+        self.recipe_ids = recipe_ids
+        self.buckets = buckets
+        self.total = sum(count for _, _, _, count in buckets)
+
+    def __len__(self):
+        return self.total
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop, _ = index.indices(self.total)
+        matches = []
+        for coverage, missing, bitmap, count in self.buckets:
+            if start >= count:
+                start -= count
+                stop -= count
+                continue
+            for offset, position in enumerate(iter_bits_reversed(bitmap)):
+                if offset >= stop:
+                    break
+                if offset >= start:
+                    matches.append(RecipeMatch(
+                        self.recipe_ids[position], coverage, missing
+                    ))
+            if stop <= count:
+                break
+            start, stop = 0, stop - count
+        return matches
+
+
+class RecipeIngredientIndex(RecipeIndex):
+
+    def build(self):
+        rows = list(self.model.ingredients.through.objects.values_list(
+            'recipe_id', 'ingredient_id'
+        ).iterator())
+        self.recipe_ids = sorted({recipe_id for recipe_id, _ in rows})
+        self.positions = {
+            recipe_id: position
+            for position, recipe_id in enumerate(self.recipe_ids)
+        }
+        self.recipe_ingredients = defaultdict(set)
+        by_ingredient = defaultdict(list)
+        for recipe_id, ingredient_id in rows:
+            self.recipe_ingredients[recipe_id].add(ingredient_id)
+            by_ingredient[ingredient_id].append(self.positions[recipe_id])
+        self.recipe_ingredients = dict(self.recipe_ingredients)
+        by_size = defaultdict(list)
+        for recipe_id, ingredient_ids in self.recipe_ingredients.items():
+            by_size[len(ingredient_ids)].append(self.positions[recipe_id])
+        total = len(self.recipe_ids)
+        self.bitmaps = {
+            ingredient_id: to_bitmap(recipe_positions, total)
+            for ingredient_id, recipe_positions in by_ingredient.items()
+        }
+        self.size_bitmaps = {
+            size: to_bitmap(recipe_positions, total)
+            for size, recipe_positions in by_size.items()
+        }
+
+    def update(self, recipe_ids):
+        recipe_ingredients = defaultdict(set)
+        for recipe_id, ingredient_id in (
+            self.model.ingredients.through.objects.filter(
+                recipe_id__in=recipe_ids
+            ).values_list('recipe_id', 'ingredient_id')
+        ):
+            recipe_ingredients[recipe_id].add(ingredient_id)
+        last_id = self.recipe_ids[-1] if self.recipe_ids else 0
+        if any(
+            recipe_id not in self.positions and recipe_id < last_id
+            for recipe_id in recipe_ingredients
+        ):
+            return self.build()
+        for recipe_id in sorted(recipe_ids):
+            self.remove(recipe_id)
+            self.add(recipe_id, recipe_ingredients.get(recipe_id))
+
+    def add(self, recipe_id, ingredient_ids):
+        if not ingredient_ids:
+            return
+        if recipe_id not in self.positions:
+            self.positions[recipe_id] = len(self.recipe_ids)
+            self.recipe_ids.append(recipe_id)
+        bit = 1 << self.positions[recipe_id]
+        for ingredient_id in ingredient_ids:
+            self.bitmaps[ingredient_id] = (
+                self.bitmaps.get(ingredient_id, 0) | bit
+            )
+        size = len(ingredient_ids)
+        self.size_bitmaps[size] = self.size_bitmaps.get(size, 0) | bit
+        self.recipe_ingredients[recipe_id] = ingredient_ids
+
+    def remove(self, recipe_id):
+        ingredient_ids = self.recipe_ingredients.pop(recipe_id, None)
+        if not ingredient_ids:
+            return
+        bit = 1 << self.positions[recipe_id]
+        for ingredient_id in ingredient_ids:
+            self.bitmaps[ingredient_id] &= ~bit
+            if not self.bitmaps[ingredient_id]:
+                del self.bitmaps[ingredient_id]
+        size = len(ingredient_ids)
+        self.size_bitmaps[size] &= ~bit
+        if not self.size_bitmaps[size]:
+            del self.size_bitmaps[size]
+
+    @synchronized
+    def match(self, ingredient_ids):
+        bitmaps = [
+            self.bitmaps[ingredient_id]
+            for ingredient_id in set(ingredient_ids)
+            if ingredient_id in self.bitmaps
+        ]
+        matched = 0
+        counters = []
+        for carry in bitmaps:
+            matched |= carry
+            for level, counter in enumerate(counters):
+                counters[level] = counter ^ carry
+                carry &= counter
+                if not carry:
+                    break
+            if carry:
+                counters.append(carry)
+        with_count = {}
+        max_count = min(len(bitmaps), 2 ** len(counters) - 1)
+        for count in range(1, max_count + 1):
+            bitmap = matched
+            for level, counter in enumerate(counters):
+                bitmap &= counter if count >> level & 1 else ~counter
+            if bitmap:
+                with_count[count] = bitmap
+        buckets = defaultdict(int)
+        for size, size_bitmap in self.size_bitmaps.items():
+            for count, count_bitmap in with_count.items():
+                if count <= size:
+                    buckets[count / size, size - count] |= (
+                        count_bitmap & size_bitmap
+                    )
+        return RecipeMatches(self.recipe_ids, sorted(
+            (
+                (coverage, missing, bitmap, count_bits(bitmap))
+                for (coverage, missing), bitmap in buckets.items() if bitmap
+            ),
+            key=lambda bucket: (-bucket[0], bucket[1])
+        ))
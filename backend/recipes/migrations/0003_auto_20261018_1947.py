@@ -0,0 +1,94 @@
+# Generated by Django 3.2.4 on 2026-10-18 16:47
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0002_auto_20241015_1139'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='favorite',
+            options={'verbose_name': 'Избранное', 'verbose_name_plural': 'Избранное'},
+        ),
+        migrations.AlterModelOptions(
+            name='recipe',
+            options={'ordering': ('-pub_date',), 'verbose_name': 'Рецепт', 'verbose_name_plural': 'Рецепты'},
+        ),
+        migrations.AlterModelOptions(
+            name='shoppingcart',
+            options={'verbose_name': 'Список покупок', 'verbose_name_plural': 'Списки покупок'},
+        ),
+        migrations.RenameField(
+            model_name='recipe',
+            old_name='short_url',
+            new_name='slug',
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='pub_date',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Дата публикации'),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='ingredient',
+            name='measurement_unit',
+            field=models.CharField(max_length=64, verbose_name='Единица измерения'),
+        ),
+        migrations.AlterField(
+            model_name='ingredient',
+            name='name',
+            field=models.CharField(db_index=True, max_length=128, verbose_name='Название'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='cooking_time',
+            field=models.PositiveSmallIntegerField(validators=[django.core.validators.MinValueValidator(1, 'Время готовки не может быть меньше 1'), django.core.validators.MaxValueValidator(32767, 'Время готовки не может быть меньше 32767')], verbose_name='Время готовки'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='name',
+            field=models.CharField(max_length=256, verbose_name='Название'),
+        ),
+        migrations.AlterField(
+            model_name='recipeingredient',
+            name='amount',
+            field=models.PositiveSmallIntegerField(validators=[django.core.validators.MinValueValidator(1, 'Колличество ингридиентов должно быть больше 1'), django.core.validators.MaxValueValidator(32767, 'Колличество ингридиентов должно быть меньше32767')], verbose_name='Количество'),
+        ),
+        migrations.AlterField(
+            model_name='shoppingcart',
+            name='recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shoppingcarts', to='recipes.recipe', verbose_name='Рецепт'),
+        ),
+        migrations.AlterField(
+            model_name='shoppingcart',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shoppingcarts', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AlterField(
+            model_name='tag',
+            name='name',
+            field=models.CharField(max_length=32, unique=True, verbose_name='Название'),
+        ),
+        migrations.AlterField(
+            model_name='tag',
+            name='slug',
+            field=models.SlugField(max_length=32, unique=True, verbose_name='Слаг'),
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_name_measurement_unit'),
+        ),
+        migrations.AddConstraint(
+            model_name='recipeingredient',
+            constraint=models.UniqueConstraint(fields=('recipe', 'ingredient'), name='unique_recipe_ingredient'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations, models
+
+from recipes.services import normalize_ingredient_name
+
+BATCH_SIZE = 1000
+
+
+def fill_search_names(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    ingredients = []
+    for ingredient in Ingredient.objects.only('name').iterator():
+        ingredient.search_name = normalize_ingredient_name(ingredient.name)
+        ingredients.append(ingredient)
+        if len(ingredients) == BATCH_SIZE:
+            Ingredient.objects.bulk_update(ingredients, ('search_name',))
+            ingredients = []
+    Ingredient.objects.bulk_update(ingredients, ('search_name',))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_auto_20261018_1947'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='search_name',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=128, verbose_name='Название для поиска'),
+        ),
+        migrations.RunPython(fill_search_names, migrations.RunPython.noop),
+    ]
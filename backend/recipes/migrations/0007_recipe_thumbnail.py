@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipe_pub_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='thumbnail',
+            field=models.ImageField(blank=True, editable=False, upload_to='media/recipes/thumbnails/', verbose_name='Миниатюра'),
+        ),
+    ]
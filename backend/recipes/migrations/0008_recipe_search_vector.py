@@ -0,0 +1,50 @@
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+import recipes.search
+
+
+def fill_search_vectors(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Recipe.objects.update(
+        search_vector=recipes.search.get_search_vector(Recipe)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_thumbnail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=recipes.search.SearchVectorIndex(fields=['search_vector'], name='recipe_search_vector_idx'),
+        ),
+        migrations.CreateModel(
+            name='CatalogueChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('label', models.CharField(max_length=100, verbose_name='Модель')),
+                ('version', models.PositiveBigIntegerField(verbose_name='Версия')),
+                ('object_id', models.PositiveIntegerField(verbose_name='Объект')),
+            ],
+            options={
+                'verbose_name': 'Изменение справочника',
+                'verbose_name_plural': 'Изменения справочников',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='cataloguechange',
+            index=models.Index(fields=['label', 'version'], name='catalogue_change_version_idx'),
+        ),
+        migrations.RunPython(fill_search_vectors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+BATCH_SIZE = 1000
+
+
+def fill_feeds(apps, schema_editor):
+    FeedEntry = apps.get_model('recipes', 'FeedEntry')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    entries = []
+    for user_id, recipe_id, author_id, pub_date in Recipe.objects.filter(
+        author__subscriptions_on_author__isnull=False
+    ).order_by().values_list(
+        'author__subscriptions_on_author__user_id', 'pk', 'author_id',
+        'pub_date'
+    ).iterator():
+        entries.append(FeedEntry(
+            user_id=user_id, recipe_id=recipe_id, author_id=author_id,
+            pub_date=pub_date
+        ))
+        if len(entries) == BATCH_SIZE:
+            FeedEntry.objects.bulk_create(entries)
+            entries = []
+    FeedEntry.objects.bulk_create(entries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('users', '0002_auto_20261018_1947'),
+        ('recipes', '0008_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='recipes.recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to=settings.AUTH_USER_MODEL, verbose_name='Подписчик')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Лента подписок',
+                'ordering': ('-pub_date', '-recipe_id'),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['user', '-pub_date', '-recipe'], name='feed_user_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['user', 'author'], name='feed_user_author_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_user_recipe_feed'),
+        ),
+        migrations.RunPython(fill_feeds, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def get_count(model, lookup):
+    return Coalesce(Subquery(
+        model.objects.filter(**{lookup: OuterRef('pk')}).order_by().values(
+            lookup
+        ).annotate(count=Count('pk')).values('count')
+    ), 0)
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    User = apps.get_model('users', 'User')
+    Recipe.objects.update(
+        favorites_count=get_count(
+            apps.get_model('recipes', 'Favorite'), 'recipe'
+        ),
+        shopping_carts_count=get_count(
+            apps.get_model('recipes', 'ShoppingCart'), 'recipe'
+        ),
+    )
+    User.objects.update(
+        recipes_count=get_count(Recipe, 'author'),
+        subscribers_count=get_count(
+            apps.get_model('users', 'Subscription'), 'author'
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_user_counters'),
+        ('recipes', '0009_feedentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Кол-во в избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='shopping_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Кол-во в списках покупок'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-favorites_count', '-pub_date', '-id'], name='recipe_popularity_idx'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
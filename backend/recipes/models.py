@@ -1,14 +1,64 @@
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db import models
+from django.db import models, transaction
 
-from .services import generate_url_slug
+from .images import get_thumbnail_name, schedule_thumbnail
+from .search import SearchVectorIndex, update_search_vectors
+from .services import (
+    bump_catalogue_version, cache_short_link, encode_base62
+)
 from api.constants import (
     MAX_LENGTH_TAGS, MIN_VALUE,
-    LENGTH_SHORT_URL, MAX_LENGTH_INGREDIENT,
+    LENGTH_SHORT_URL, MAX_LENGTH_INGREDIENT, MAX_LENGTH_LABEL,
     MAX_LENGTH_UNIT, MAX_LENGTH_RECIPES,
     MAX_VALUE)
-from users.models import User
+from users.models import CountersModel, User
+
+
+class CatalogueVersion(models.Model):
+    label = models.CharField(
+        'Модель',
+        max_length=MAX_LENGTH_LABEL,
+        unique=True,
+    )
+    version = models.PositiveBigIntegerField(
+        'Версия',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'Версия справочника'
+        verbose_name_plural = 'Версии справочников'
+
+    def __str__(self):
+        return f'{self.label}: {self.version}'
+
+
+class CatalogueChange(models.Model):
+    label = models.CharField(
+        'Модель',
+        max_length=MAX_LENGTH_LABEL,
+    )
+    version = models.PositiveBigIntegerField(
+        'Версия',
+    )
+    object_id = models.PositiveIntegerField(
+        'Объект',
+    )
+
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=('label', 'version'),
+                name='catalogue_change_version_idx'
+            ),
+        )
+        verbose_name = 'Изменение справочника'
+        verbose_name_plural = 'Изменения справочников'
+
+    def __str__(self):
+        return f'{self.label}: {self.version} ({self.object_id})'
 
 
 class Tag(models.Model):
@@ -41,6 +91,13 @@ class Ingredient(models.Model):
         'Единица измерения',
         max_length=MAX_LENGTH_UNIT,
     )
+    search_name = models.CharField(
+        'Название для поиска',
+        max_length=MAX_LENGTH_INGREDIENT,
+        db_index=True,
+        editable=False,
+        default='',
+    )
 
     class Meta:
         verbose_name = 'Ингредиент'
@@ -56,7 +113,57 @@ class Ingredient(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+
+    def with_related(self):
+        return self.select_related('author').defer(
+            'search_vector'
+        ).prefetch_related(
+            'tags',
+            models.Prefetch(
+                'recipeingredients',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient'
+                )
+            ),
+        )
+
+    def first_per_author(self, limit):
+        if limit is None:
+            return self
+        return self.filter(pk__in=models.Subquery(
+            self.model.objects.filter(
+                author=models.OuterRef('author')
+            ).values('pk')[:limit]
+        ))
+
+    def with_user_flags(self, user):
+        if not user.is_authenticated:
+            return self.annotate(
+                is_favorited=models.Value(
+                    False, output_field=models.BooleanField()
+                ),
+                is_in_shopping_cart=models.Value(
+                    False, output_field=models.BooleanField()
+                ),
+            )
+        return self.annotate(
+            is_favorited=models.Exists(
+                Favorite.objects.filter(
+                    user=user, recipe=models.OuterRef('pk')
+                )
+            ),
+            is_in_shopping_cart=models.Exists(
+                ShoppingCart.objects.filter(
+                    user=user, recipe=models.OuterRef('pk')
+                )
+            ),
+        )
+
+
+class Recipe(CountersModel):
+    counter_fields = ('favorites_count', 'shopping_carts_count')
+
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -71,6 +178,12 @@ class Recipe(models.Model):
         'Картинка',
         upload_to='media/recipes/',
     )
+    thumbnail = models.ImageField(
+        'Миниатюра',
+        upload_to='media/recipes/thumbnails/',
+        blank=True,
+        editable=False,
+    )
     text = models.TextField(
         'Описание',
     )
@@ -109,9 +222,40 @@ class Recipe(models.Model):
         'Дата публикации',
         auto_now_add=True,
     )
+    favorites_count = models.PositiveIntegerField(
+        'Кол-во в избранном',
+        default=0,
+        editable=False,
+    )
+    shopping_carts_count = models.PositiveIntegerField(
+        'Кол-во в списках покупок',
+        default=0,
+        editable=False,
+    )
+    search_vector = SearchVectorField(
+        'Поисковый вектор',
+        null=True,
+        editable=False,
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-id')
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=('-favorites_count', '-pub_date', '-id'),
+                name='recipe_popularity_idx'
+            ),
+            SearchVectorIndex(
+                fields=('search_vector',),
+                name='recipe_search_vector_idx'
+            ),
+        )
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
 
@@ -119,9 +263,28 @@ class Recipe(models.Model):
         return self.name
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = generate_url_slug(self.__class__, LENGTH_SHORT_URL)
-        super().save(*args, **kwargs)
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+            if not self.slug:
+                self.slug = encode_base62(self.pk)
+                Recipe.objects.filter(pk=self.pk).update(slug=self.slug)
+        slug, pk, image_name = self.slug, self.pk, self.image.name
+        transaction.on_commit(lambda: cache_short_link(slug, pk))
+        transaction.on_commit(
+            lambda: update_search_vectors(Recipe.objects.filter(pk=pk))
+        )
+        transaction.on_commit(lambda: bump_catalogue_version(Recipe, (pk,)))
+        thumbnail_name = self.thumbnail.name
+        if image_name and thumbnail_name != get_thumbnail_name(
+            pk, image_name
+        ):
+            transaction.on_commit(lambda: schedule_thumbnail(
+                Recipe, pk, image_name, thumbnail_name
+            ))
+
+    @property
+    def preview(self):
+        return self.thumbnail or self.image
 
 
 class RecipeIngredient(models.Model):
@@ -213,3 +376,49 @@ class ShoppingCart(UserRecipeModel):
                 name='unique_user_recipe_cart'
             ),
         )
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Подписчик'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт'
+    )
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ('-pub_date', '-recipe_id')
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_user_recipe_feed'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date', '-recipe'),
+                name='feed_user_pub_date_idx'
+            ),
+            models.Index(
+                fields=('user', 'author'),
+                name='feed_user_author_idx'
+            ),
+        )
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+
+    def __str__(self):
+        return f'{self.recipe_id} в ленте {self.user_id}'
@@ -0,0 +1,235 @@
+import logging
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_left
+from collections import defaultdict, namedtuple
+from heapq import nlargest
+from math import log, sqrt
+from tempfile import NamedTemporaryFile
+
+from django.conf import settings
+
+from api.constants import (
+    RECOMMENDATION_CANDIDATES, RECOMMENDATION_MAX_FEATURE_RECIPES,
+    RECOMMENDATION_POPULAR, RECOMMENDATION_TOP_K
+)
+
+MODEL_MAGIC = b'FGRM'
+MODEL_VERSION = 1
+MODEL_HEADER = struct.Struct('=4sIIIII')
+INTERACTION_WEIGHTS = {'favorite': 1.0, 'cart': 0.5}
+SIMILARITY_WEIGHTS = {'interactions': 0.6, 'content': 0.4}
+TAG_WEIGHT = 0.5
+
+Recommendation = namedtuple('Recommendation', ('recipe_id', 'score'))
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(vectors):
+    for vector in vectors.values():
+        norm = sqrt(sum(value * value for value in vector.values()))
+        for key in vector:
+            vector[key] /= norm
+    return vectors
+
+
+def invert(vectors):
+    postings = defaultdict(list)
+    for key, vector in vectors.items():
+        for feature, value in vector.items():
+            postings[feature].append((key, value))
+    return postings
+
+
+def get_interaction_vectors(recipe_ids, interactions):
+    vectors = defaultdict(dict)
+    for kind, rows in interactions.items():
+        for user_id, recipe_id in rows:
+            if recipe_id in recipe_ids:
+                vector = vectors[recipe_id]
+                vector[user_id] = max(
+                    vector.get(user_id, 0), INTERACTION_WEIGHTS[kind]
+                )
+    return normalize(vectors)
+
+
+def get_content_vectors(recipe_count, features):
+    vectors = defaultdict(dict)
+    frequencies = defaultdict(int)
+    for recipe_id, feature, _ in features:
+        frequencies[feature] += 1
+    for recipe_id, feature, weight in features:
+        vectors[recipe_id][feature] = weight * log(
+            1 + recipe_count / frequencies[feature]
+        )
+    return normalize(vectors), frequencies
+
+
+def get_neighbours(recipe_id, interactions, interaction_postings,
+                   content, content_postings, frequencies):
+    similar = defaultdict(float)
+    for user_id, value in interactions.get(recipe_id, {}).items():
+        for neighbour_id, other in interaction_postings[user_id]:
+            similar[neighbour_id] += value * other
+    shared = defaultdict(float)
+    for feature, value in content.get(recipe_id, {}).items():
+        if frequencies[feature] > RECOMMENDATION_MAX_FEATURE_RECIPES:
+            continue
+        for neighbour_id, other in content_postings[feature]:
+            shared[neighbour_id] += value * other
+    candidates = {
+        neighbour_id: (
+            SIMILARITY_WEIGHTS['interactions'] * similar.get(neighbour_id, 0)
+            + SIMILARITY_WEIGHTS['content'] * shared.get(neighbour_id, 0)
+        )
+        for scores in (similar, shared)
+        for neighbour_id in nlargest(
+            RECOMMENDATION_CANDIDATES, scores, key=scores.get
+        )
+        if neighbour_id != recipe_id
+    }
+    return nlargest(
+        RECOMMENDATION_TOP_K, candidates.items(), key=lambda item: item[1]
+    )
+
+
+def build_model(recipe_ids, interactions, features):
+    recipe_ids = sorted(recipe_ids)
+    positions = {
+        recipe_id: position for position, recipe_id in enumerate(recipe_ids)
+    }
+    interaction_vectors = get_interaction_vectors(positions, interactions)
+    content_vectors, frequencies = get_content_vectors(
+        len(recipe_ids), features
+    )
+    interaction_postings = invert(interaction_vectors)
+    content_postings = invert(content_vectors)
+    offsets = array('I', [0])
+    neighbours = array('I')
+    scores = array('f')
+    for recipe_id in recipe_ids:
+        for neighbour_id, score in get_neighbours(
+            recipe_id, interaction_vectors, interaction_postings,
+            content_vectors, content_postings, frequencies
+        ):
+            if score > 0:
+                neighbours.append(positions[neighbour_id])
+                scores.append(score)
+        offsets.append(len(neighbours))
+    popularity = defaultdict(float)
+    for kind, rows in interactions.items():
+        for _, recipe_id in rows:
+            if recipe_id in positions:
+                popularity[recipe_id] += INTERACTION_WEIGHTS[kind]
+    popular = array('I', (
+        positions[recipe_id] for recipe_id in nlargest(
+            RECOMMENDATION_POPULAR, popularity,
+            key=lambda recipe_id: (popularity[recipe_id], recipe_id)
+        )
+    ))
+    return array('Q', recipe_ids), offsets, neighbours, scores, popular
+
+
+def write_model(path, recipe_ids, offsets, neighbours, scores, popular):
+    directory = os.path.dirname(os.path.abspath(path))
+    with NamedTemporaryFile(dir=directory, delete=False) as file:
+        file.write(MODEL_HEADER.pack(
+            MODEL_MAGIC, MODEL_VERSION, len(recipe_ids), len(neighbours),
+            len(popular), 0
+        ))
+        for values in (recipe_ids, offsets, neighbours, scores, popular):
+            values.tofile(file)
+    os.chmod(file.name, 0o644)
+    os.replace(file.name, path)
+
+
+class RecommendationModel:
+
+    def __init__(self):
+        self.stamp = None
+        self.load(None)
+
+    def refresh(self):
+        path = settings.RECOMMENDATIONS_PATH
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            stamp = None
+        else:
+            stamp = (str(path), stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if stamp != self.stamp:
+            try:
+                self.load(path if stamp else None)
+            except (OSError, TypeError, ValueError, struct.error) as error:
+                logger.error(
+                    'Не удалось загрузить модель рекомендаций: %s', error
+                )
+                self.load(None)
+            self.stamp = stamp
+        return self
+
+    def load(self, path):
+        if path is None:
+            self.recipe_ids = self.offsets = self.popular = ()
+            self.neighbours = self.scores = ()
+            return
+        with open(path, 'rb') as file:
+            buffer = memoryview(mmap.mmap(
+                file.fileno(), 0, access=mmap.ACCESS_READ
+            ))
+        magic, version, recipes, neighbours, popular, _ = (
+            MODEL_HEADER.unpack_from(buffer)
+        )
+        if magic != MODEL_MAGIC or version != MODEL_VERSION:
+            raise ValueError(f'неизвестный формат файла {path}')
+        offset = MODEL_HEADER.size
+        sections = []
+        for code, length in (
+            ('Q', recipes), ('I', recipes + 1), ('I', neighbours),
+            ('f', neighbours), ('I', popular)
+        ):
+            size = length * array(code).itemsize
+            sections.append(buffer[offset:offset + size].cast(code))
+            offset += size
+        if offset != len(buffer):
+            raise ValueError(f'поврежден файл {path}')
+        (
+            self.recipe_ids, self.offsets, self.neighbours, self.scores,
+            self.popular
+        ) = sections
+
+    def get_neighbour_positions(self, recipe_id):
+        position = bisect_left(self.recipe_ids, recipe_id)
+        if (
+            position == len(self.recipe_ids)
+            or self.recipe_ids[position] != recipe_id
+        ):
+            return ()
+        start, end = self.offsets[position], self.offsets[position + 1]
+        return zip(self.neighbours[start:end], self.scores[start:end])
+
+    def recommend(self, seeds, exclude):
+        scores = defaultdict(float)
+        for recipe_id, weight in seeds.items():
+            for position, score in self.get_neighbour_positions(recipe_id):
+                scores[self.recipe_ids[position]] += weight * score
+        recommendations = sorted(
+            (
+                Recommendation(recipe_id, score)
+                for recipe_id, score in scores.items()
+                if recipe_id not in exclude
+            ),
+            key=lambda recommendation: (
+                -recommendation.score, -recommendation.recipe_id
+            )
+        )
+        if recommendations:
+            return recommendations
+        return [
+            Recommendation(self.recipe_ids[position], 0.0)
+            for position in self.popular
+            if self.recipe_ids[position] not in exclude
+        ]
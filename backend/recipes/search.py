@@ -0,0 +1,174 @@
+import re
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from heapq import nlargest
+from math import log
+from operator import itemgetter
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector
+)
+from django.db import connection
+from django.db.models import (
+    Case, F, FloatField, Index, OuterRef, Subquery, Value, When
+)
+
+from api.constants import SEARCH_FALLBACK_LIMIT
+from .services import RecipeIndex, synchronized
+
+SEARCH_CONFIG = 'russian'
+SEARCH_WEIGHTS = {'A': 1.0, 'B': 0.4, 'C': 0.2}
+TOKEN_RE = re.compile(r'\w+')
+MAX_CHAR = chr(0x10ffff)
+
+
+class SearchVectorIndex(GinIndex):
+
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        if schema_editor.connection.vendor != 'postgresql':
+            return Index.create_sql(
+                self, model, schema_editor, using=using, **kwargs
+            )
+        return super().create_sql(model, schema_editor, using, **kwargs)
+
+
+def uses_search_vector():
+    return connection.vendor == 'postgresql'
+
+
+def get_search_vector(model):
+    ingredient_names = Subquery(
+        model.ingredients.through.objects.filter(
+            recipe=OuterRef('pk')
+        ).values('recipe').annotate(
+            names=StringAgg('ingredient__name', ' ')
+        ).values('names')
+    )
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(ingredient_names, weight='B', config=SEARCH_CONFIG)
+        + SearchVector('text', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(queryset):
+    if uses_search_vector():
+        queryset.update(search_vector=get_search_vector(queryset.model))
+
+
+def tokenize(text):
+    return [
+        token.replace('ё', 'е') for token in TOKEN_RE.findall(text.lower())
+    ]
+
+
+class RecipeSearchIndex(RecipeIndex):
+
+    def build(self):
+        self.postings = {}
+        self.documents = {}
+        self.index(
+            self.model.objects.all(),
+            self.model.ingredients.through.objects.all()
+        )
+        self.terms = sorted(self.postings)
+
+    def update(self, recipe_ids):
+        removed = set()
+        for recipe_id in recipe_ids:
+            removed |= self.remove(recipe_id)
+        added = self.index(
+            self.model.objects.filter(pk__in=recipe_ids),
+            self.model.ingredients.through.objects.filter(
+                recipe_id__in=recipe_ids
+            )
+        )
+        for term in removed - added:
+            del self.terms[bisect_left(self.terms, term)]
+        for term in added - removed:
+            insort(self.terms, term)
+
+    def index(self, recipes, recipe_ingredients):
+        added = set()
+
+        def add(recipe_id, text, weight):
+            for token in tokenize(text):
+                if token not in self.postings:
+                    self.postings[token] = {}
+                    added.add(token)
+                weights = self.postings[token]
+                weights[recipe_id] = (
+                    weights.get(recipe_id, 0) + SEARCH_WEIGHTS[weight]
+                )
+                self.documents[recipe_id].add(token)
+
+        for pk, name, text in recipes.values_list(
+            'pk', 'name', 'text'
+        ).iterator():
+            self.documents[pk] = set()
+            add(pk, name, 'A')
+            add(pk, text, 'C')
+        for recipe_id, name in recipe_ingredients.values_list(
+            'recipe_id', 'ingredient__name'
+        ).iterator():
+            if recipe_id in self.documents:
+                add(recipe_id, name, 'B')
+        return added
+
+    def remove(self, recipe_id):
+        removed = set()
+        for term in self.documents.pop(recipe_id, ()):
+            weights = self.postings[term]
+            del weights[recipe_id]
+            if not weights:
+                del self.postings[term]
+                removed.add(term)
+        return removed
+
+    @synchronized
+    def search(self, query):
+        scores = None
+        for token in tokenize(query):
+            matched = defaultdict(float)
+            for term in self.terms[
+                bisect_left(self.terms, token):
+                bisect_right(self.terms, token + MAX_CHAR)
+            ]:
+                for recipe_id, weight in self.postings[term].items():
+                    matched[recipe_id] += weight
+            idf = log(1 + len(self.documents) / len(matched)) if matched else 0
+            scores = {
+                recipe_id: (scores or {}).get(recipe_id, 0) + weight * idf
+                for recipe_id, weight in matched.items()
+                if scores is None or recipe_id in scores
+            }
+            if not scores:
+                return {}
+        return scores or {}
+
+
+def search_recipes(queryset, value, search_index):
+    if uses_search_vector():
+        query = SearchQuery(value, config=SEARCH_CONFIG)
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by('-rank', *queryset.model._meta.ordering)
+    scores = nlargest(
+        SEARCH_FALLBACK_LIMIT,
+        search_index.refresh().search(value).items(),
+        key=itemgetter(1)
+    )
+    return queryset.filter(
+        pk__in=[recipe_id for recipe_id, _ in scores]
+    ).annotate(
+        rank=Case(
+            *(
+                When(pk=recipe_id, then=Value(score))
+                for recipe_id, score in scores
+            ),
+            default=Value(0.0),
+            output_field=FloatField()
+        )
+    ).order_by('-rank', *queryset.model._meta.ordering)
@@ -1,8 +1,158 @@
-from django.utils.crypto import get_random_string
+import string
+from functools import wraps
+from threading import RLock
 
+from django.apps import apps
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
 
-def generate_url_slug(model_class, length):
+from api.constants import (
+    CATALOGUE_CHANGES_LIMIT, SHORT_LINK_MISSING_TIMEOUT, SHORT_LINK_TIMEOUT
+)
+
+BASE62_ALPHABET = string.digits + string.ascii_letters
+SHORT_LINK_CACHE_KEY = 'short_link:{}'
+
+
+def encode_base62(number):
+    digits = []
     while True:
-        slug = get_random_string(length=length)
-        if not model_class.objects.filter(slug=slug).exists():
-            return slug
+        number, remainder = divmod(number, len(BASE62_ALPHABET))
+        digits.append(BASE62_ALPHABET[remainder])
+        if not number:
+            return ''.join(reversed(digits))
+
+
+def get_cached_short_link(slug):
+    return cache.get(SHORT_LINK_CACHE_KEY.format(slug))
+
+
+def cache_short_link(slug, recipe_id):
+    cache.set(
+        SHORT_LINK_CACHE_KEY.format(slug),
+        recipe_id or 0,
+        SHORT_LINK_TIMEOUT if recipe_id else SHORT_LINK_MISSING_TIMEOUT
+    )
+
+
+def forget_short_link(slug):
+    cache.delete(SHORT_LINK_CACHE_KEY.format(slug))
+
+
+def normalize_ingredient_name(name):
+    return name.strip().lower().replace('ё', 'е')
+
+
+class CatalogueVersions:
+
+    def __init__(self):
+        self.versions = None
+
+    def clear(self):
+        self.versions = None
+
+    def get_model(self, model_name='CatalogueVersion'):
+        return apps.get_model('recipes', model_name)
+
+    def get(self, model):
+        if self.versions is None:
+            self.versions = dict(
+                self.get_model().objects.values_list('label', 'version')
+            )
+        return self.versions.get(model._meta.label_lower, 0)
+
+    def bump(self, model, object_ids=()):
+        label = model._meta.label_lower
+        versions = self.get_model().objects.filter(label=label)
+        with transaction.atomic(savepoint=False):
+            if not versions.update(version=F('version') + 1):
+                self.get_model().objects.get_or_create(label=label)
+                versions.update(version=F('version') + 1)
+            if object_ids:
+                version = versions.values_list('version', flat=True).get()
+                changes = self.get_model('CatalogueChange').objects
+                changes.bulk_create(
+                    changes.model(
+                        label=label, version=version, object_id=object_id
+                    )
+                    for object_id in object_ids
+                )
+                if not version % CATALOGUE_CHANGES_LIMIT:
+                    changes.filter(
+                        label=label,
+                        version__lte=version - CATALOGUE_CHANGES_LIMIT
+                    ).delete()
+        self.clear()
+
+    def get_changes(self, model, since, until):
+        if not 0 < until - since <= CATALOGUE_CHANGES_LIMIT:
+            return None
+        rows = self.get_model('CatalogueChange').objects.filter(
+            label=model._meta.label_lower,
+            version__gt=since,
+            version__lte=until
+        ).values_list('version', 'object_id')
+        versions, object_ids = set(), set()
+        for version, object_id in rows:
+            versions.add(version)
+            object_ids.add(object_id)
+        if len(versions) != until - since:
+            return None
+        return object_ids
+
+
+catalogue_versions = CatalogueVersions()
+
+
+def get_catalogue_version(model):
+    return catalogue_versions.get(model)
+
+
+def bump_catalogue_version(model, object_ids=()):
+    catalogue_versions.bump(model, object_ids)
+
+
+def synchronized(method):
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class RecipeIndex:
+
+    def __init__(self, model):
+        self.model = model
+        self.version = None
+        self.lock = RLock()
+
+    def get_version(self):
+        return (
+            get_catalogue_version(self.model),
+            get_catalogue_version(self.model.ingredients.field.related_model)
+        )
+
+    @synchronized
+    def refresh(self):
+        version = self.get_version()
+        if version == self.version:
+            return self
+        recipe_ids = None
+        if self.version is not None and version[1] == self.version[1]:
+            recipe_ids = catalogue_versions.get_changes(
+                self.model, self.version[0], version[0]
+            )
+        if recipe_ids is None:
+            self.build()
+        else:
+            self.update(recipe_ids)
+        self.version = version
+        return self
+
+    def build(self):
+        raise NotImplementedError
+
+    def update(self, recipe_ids):
+        raise NotImplementedError
@@ -0,0 +1,120 @@
+from django.core.signals import request_started
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+
+from .counters import RECIPE_COUNTERS, change_counter, suspended_counters
+from .feed import add_author_to_feed, fan_out_recipe, remove_author_from_feed
+from .models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from .services import (
+    bump_catalogue_version, catalogue_versions, forget_short_link,
+    normalize_ingredient_name
+)
+from users.models import Subscription, User
+
+
+@receiver(request_started)
+def reset_catalogue_versions(sender, **kwargs):
+    catalogue_versions.clear()
+
+
+@receiver(pre_save, sender=Ingredient)
+def set_ingredient_search_name(sender, instance, **kwargs):
+    instance.search_name = normalize_ingredient_name(instance.name)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_catalogue(sender, **kwargs):
+    bump_catalogue_version(sender)
+
+
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe(sender, instance, **kwargs):
+    bump_catalogue_version(sender, (instance.pk,))
+
+
+@receiver(post_delete, sender=Recipe)
+def invalidate_short_link(sender, instance, **kwargs):
+    if instance.slug:
+        forget_short_link(instance.slug)
+
+
+@receiver(post_save, sender=Recipe)
+def add_recipe_to_feeds(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        fan_out_recipe(instance)
+
+
+@receiver(post_save, sender=Subscription)
+def add_author_recipes_to_feed(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        add_author_to_feed(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Subscription)
+def remove_author_recipes_from_feed(sender, instance, **kwargs):
+    remove_author_from_feed(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Recipe)
+def increment_recipes_count(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        change_counter(
+            User.objects.filter(pk=instance.author_id), 'recipes_count', 1
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def decrement_recipes_count(sender, instance, **kwargs):
+    change_counter(
+        User.objects.filter(pk=instance.author_id), 'recipes_count', -1
+    )
+
+
+@receiver(post_save, sender=Subscription)
+def increment_subscribers_count(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        change_counter(
+            User.objects.filter(pk=instance.author_id), 'subscribers_count', 1
+        )
+
+
+@receiver(post_delete, sender=Subscription)
+def decrement_subscribers_count(sender, instance, **kwargs):
+    change_counter(
+        User.objects.filter(pk=instance.author_id), 'subscribers_count', -1
+    )
+
+
+@receiver(pre_delete, sender=Recipe)
+def start_recipe_deletion(sender, instance, **kwargs):
+    suspended_counters.recipe_ids.add(instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+def finish_recipe_deletion(sender, instance, **kwargs):
+    suspended_counters.recipe_ids.discard(instance.pk)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def increment_recipe_counter(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        change_counter(
+            Recipe.objects.filter(pk=instance.recipe_id),
+            RECIPE_COUNTERS[sender], 1
+        )
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def decrement_recipe_counter(sender, instance, **kwargs):
+    if instance.recipe_id not in suspended_counters.recipe_ids:
+        change_counter(
+            Recipe.objects.filter(pk=instance.recipe_id),
+            RECIPE_COUNTERS[sender], -1
+        )
@@ -1,8 +1,23 @@
-from django.shortcuts import get_object_or_404, redirect
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from django.shortcuts import redirect
 
 from .models import Recipe
+from .services import cache_short_link, get_cached_short_link
 
 
-def redirect_to_recipe(request, slug):
-    recipe = get_object_or_404(Recipe, slug=slug)
-    return redirect(f'/recipes/{recipe.id}')
+def get_recipe_id(slug):
+    recipe_id = get_cached_short_link(slug)
+    if recipe_id is None:
+        recipe_id = Recipe.objects.filter(slug=slug).values_list(
+            'id', flat=True
+        ).first()
+        cache_short_link(slug, recipe_id)
+    return recipe_id
+
+
+async def redirect_to_recipe(request, slug):
+    recipe_id = await sync_to_async(get_recipe_id)(slug)
+    if not recipe_id:
+        raise Http404('Рецепт не найден')
+    return redirect(f'/recipes/{recipe_id}')
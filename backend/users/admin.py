@@ -14,12 +14,14 @@ class UserAdmin(DefaultUserAdmin):
     search_fields = ('username', 'email', 'first_name', 'last_name')
 
     def recipe_count(self, obj):
-        return obj.recipes.count()
+        return obj.recipes_count
     recipe_count.short_description = 'Кол-во рецептов'
+    recipe_count.admin_order_field = 'recipes_count'
 
     def subscriber_count(self, obj):
-        return obj.subscriptions_on_author.count()
+        return obj.subscribers_count
     subscriber_count.short_description = 'Кол-во подписчиков'
+    subscriber_count.admin_order_field = 'subscribers_count'
 
 
 @admin.register(Subscription)
@@ -6,8 +6,31 @@ from django.forms import ValidationError
 from api.constants import MAX_LENGTH_NAME, MAX_LENGTH_EMAIL
 
 
-class User(AbstractUser):
+class CountersModel(models.Model):
+    counter_fields = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if (
+            not self._state.adding
+            and not kwargs.get('force_insert')
+            and kwargs.get('update_fields') is None
+        ):
+            excluded = set(self.counter_fields) | self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in excluded
+                and field.attname not in excluded
+            ]
+        super().save(*args, **kwargs)
+
+
+class User(AbstractUser, CountersModel):
     USERNAME_FIELD = 'email'
+    counter_fields = ('recipes_count', 'subscribers_count')
     REQUIRED_FIELDS = ('username', 'first_name', 'last_name')
 
     username = models.CharField(
@@ -43,6 +66,16 @@ class User(AbstractUser):
         blank=True,
         null=True
     )
+    recipes_count = models.PositiveIntegerField(
+        'Кол-во рецептов',
+        default=0,
+        editable=False,
+    )
+    subscribers_count = models.PositiveIntegerField(
+        'Кол-во подписчиков',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         ordering = ('username',)
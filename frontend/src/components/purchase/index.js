@@ -5,6 +5,7 @@ import cn from 'classnames'
 
 const Purchase = ({
   image,
+  thumbnail,
   name,
   cooking_time,
   id,
@@ -40,7 +41,7 @@ const Purchase = ({
           alt={name}
           className={styles.purchaseImage}
           style={{
-            backgroundImage: `url(${image})`
+            backgroundImage: `url(${thumbnail || image})`
           }}
         />
         <h3 className={styles.purchaseTitle}>